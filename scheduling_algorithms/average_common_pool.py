@@ -18,142 +18,170 @@ from elastisim_python import JobState, JobType, NodeState, pass_algorithm
 from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode
 from extension.ElastiSimExtension import *
 from extension.AgreementHandler import AgreementHandler, PoolAgreementHandler
+from extension.StateIndex import StateIndex
+from extension.FreeNodeSet import FreeNodeSet
+from extension.PolicyArrays import PolicyArrays
+from extension.ReconfigurationCost import ReconfigurationCost
+from extension.EasyBackfill import EasyBackfill
+from extension.WaterFilling import WaterFilling
+from extension.SpeedupPolicy import expand_jobs_by_marginal_speedup
 
 
-agreements = PoolAgreementHandler()
+state = StateIndex()
+lending = False  # run pending jobs on idle agreement nodes if they end before the agreement is due
+cancellation = False  # start waiting jobs on free nodes without agreement if possible and give up their agreement
+agreements = PoolAgreementHandler(lending=lending, cancellation=cancellation, state=state)
+expand_by_marginal_speedup = False  # give free nodes to the jobs that gain the most speedup
 
 
 # priority to expand job
 def get_average_job_priority(job, adjust_assigned_nodes=0):
-    node_range = job.num_nodes_max - job.num_nodes_min
+    record = job.record
+    node_range = record.num_nodes_max - record.num_nodes_min
     current_amount = len(job.assigned_nodes) - adjust_assigned_nodes
-    return (current_amount - job.num_nodes_min) / node_range
+    return (current_amount - record.num_nodes_min) / node_range
 
 
-# initial allocation is based on FCFS with backfilling
+# initial allocation is based on FCFS with EASY backfilling
+@Profiler.profile("initial_allocation")
 def initial_allocation(p_jobs, r_jobs, f_nodes, system, easy=True):
-    # checks if starting this job delays queue head.
-    def delays_head(job, req_nodes, head, running_jobs, free_nodes, system):
-        if job == head:
-            return False
-        time = float(system["time"])
-        def remaining_runtime(j): return j.start_time + j.get_estimated_runtime() - time
-        nodes_needed, head_start_time = req_nodes - len(free_nodes), time
-        for rj in sorted(running_jobs, key=remaining_runtime):
-            if nodes_needed <= 0:
-                break
-            nodes_needed -= len(rj.assigned_nodes)
-            head_start_time = time + remaining_runtime(rj)
-        return nodes_needed <= 0 and head_start_time < head.get_estimated_runtime()
-
+    backfill = EasyBackfill(r_jobs, float(system["time"]))
     for job in p_jobs:
         if len(f_nodes) == 0:
             break
 
         req_nodes = job.num_nodes_min
         if req_nodes <= len(f_nodes):
-            if easy and delays_head(job, req_nodes, p_jobs[0], r_jobs, f_nodes, system):
+            if easy and backfill.delays_head(job, req_nodes, p_jobs[0], len(f_nodes)):
                 continue
-            job.assign(f_nodes[:req_nodes])
+            job.assign(f_nodes.allocate(req_nodes))
             job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
-            del f_nodes[:req_nodes]
             p_jobs.remove(job)
+            backfill.start(job, req_nodes)
             Logger.log_event(EventType.START, job, job.assigned_nodes)
 
 
-# returns a node that can be reallocated from this running malleable job and was not selected previously
-def available_node(job: Job, shrink_nodes: dict, agreements):
-    pre_shrunk_nodes = [n for vs in shrink_nodes.values() for n in vs]
-    nodes = [n for n in job.assigned_nodes if not n in pre_shrunk_nodes]
-    nodes = [n for n in nodes if not agreements.has_agreement(n)]
-    return nodes[job.num_nodes_min] if len(nodes) > job.num_nodes_min else None
+# returns the nodes that can be reallocated from this running malleable job, the first num_nodes_min stay with the job
+def shrinkable_nodes(job: Job, agreements):
+    return [n for n in job.assigned_nodes if not agreements.has_agreement(n)]
 
 
 # calculate a list of nodes with a size of required_nodes that can by reallocated from running malleable jobs
 # malleable jobs with highest percentage node usage will be selected first
-def select_shrink_jobs(rm_jobs: list[Job], required_nodes: int, agreements):
+def select_shrink_jobs(rm_jobs: list[Job], required_nodes: int, agreements, arrays=None):
     shrink_nodes = {j: [] for j in rm_jobs}
+    if arrays is not None:
+        candidates = arrays.get_shrink_candidates(arrays.num_nodes_min)
+        nodes = {j: arrays.get_unlocked_nodes(j) for j in candidates}
+        keys = [-usage for usage in arrays.get_node_usages(candidates)]
+    else:
+        nodes = {j: shrinkable_nodes(j, agreements) for j in rm_jobs}
+        candidates = [j for j in rm_jobs if len(nodes[j]) > j.num_nodes_min]
+        keys = None
+    filling = WaterFilling(candidates, lambda j, amount: -get_average_job_priority(j, -amount), keys)
     for _ in range(required_nodes):
-        job = max(
-            filter(
-                lambda j: available_node(j, shrink_nodes, agreements) is not None,
-                rm_jobs,
-            ),
-            key=lambda j: get_average_job_priority(j, -len(shrink_nodes[j])),
-            default=None,
-        )
+        job = filling.top()
         if job is None:  # cancel if no more malleable jobs can be shrunk
             return dict()
 
-        node = available_node(job, shrink_nodes, agreements)
-        shrink_nodes[job] += [node] if node is not None else []
+        shrink_nodes[job].append(nodes[job][job.num_nodes_min + len(shrink_nodes[job])])
+        filling.take(len(nodes[job]) > job.num_nodes_min + len(shrink_nodes[job]))
     return shrink_nodes
 
 
 # shrinks running malleable jobs if those nodes can run pending jobs
 # malleable jobs with highest percentage node usage will be selected first
-def schedule_pending_job(p_jobs: list[Job], rm_jobs: list[Job], agreements):
+@Profiler.profile("schedule_pending_job")
+def schedule_pending_job(p_jobs: list[Job], rm_jobs: list[Job], agreements, arrays=None):
     # start pending jobs with min node amount, backfilling
     for p_job in p_jobs:
-        shrink_jobs = select_shrink_jobs(rm_jobs, p_job.num_nodes_min, agreements)
+        shrink_jobs = select_shrink_jobs(rm_jobs, p_job.num_nodes_min, agreements, arrays)
+        if not ReconfigurationCost.is_worth_shrink(p_job, shrink_jobs):
+            continue
         for shrink_job, nodes in shrink_jobs.items():
             if len(nodes) == 0:
                 continue
-            agreements.add_agreement(p_job, nodes)
+            agreements.add_agreement(p_job, nodes, shrink_job.get_next_scheduling_point())
             Logger.log_event(EventType.AGREEMENT_ADDED, (shrink_job, p_job), nodes)
             shrink_job.remove(nodes)
             Logger.log_event(EventType.SHRINK, shrink_job, nodes)
+            if arrays is not None:
+                arrays.update(shrink_job)
 
 
 # expands malleable jobs with all remaining free nodes. tries to average out the node usage between all mallable jobs
 # malleable jobs with lowest percentage node usage will be selected first
-def expand_running_malleable_jobs(rm_jobs: list[Job], free_nodes: list[Node]):
+@Profiler.profile("expand_running_malleable_jobs")
+def expand_running_malleable_jobs(rm_jobs: list[Job], free_nodes: FreeNodeSet, arrays=None):
     # calculate node expand amount per job
-    expand_amount = {j: 0 for j in rm_jobs}
+    keys = arrays.get_node_usages(rm_jobs) if arrays is not None else None
+    filling = WaterFilling(rm_jobs, get_average_job_priority, keys)
     for _ in range(len(free_nodes)):
-        job = min(rm_jobs, key=lambda j: get_average_job_priority(j, expand_amount[j]))
+        job = filling.top()
         if len(job.assigned_nodes) == job.num_nodes_max:
             break
-        expand_amount[job] += 1
+        filling.take()
+    expand_amount = filling.amounts
 
     # apply calculated node expand amount per job
     for job, node_amount in expand_amount.items():
         if node_amount == 0:
             continue
         amount = min(job.num_nodes_max - len(job.assigned_nodes), expand_amount[job])
-        node_to_assign = free_nodes[:amount]
+        if not ReconfigurationCost.is_worth_expand(job, amount):
+            continue
+        node_to_assign = free_nodes.allocate(amount)
         job.assign(node_to_assign)
-        del free_nodes[:amount]
         Logger.log_event(EventType.EXPAND, job, node_to_assign)
+        if arrays is not None:
+            arrays.update(job)
 
 
+@Recorder.record_invocation
+@Profiler.profile_invocation
 def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
     injectExtension(jobs, nodes, system)
-    global agreements
+    global agreements, state
 
     # filter jobs and nodes
-    p_jobs = [j for j in jobs if j.state is JobState.PENDING]
-    r_jobs = [j for j in jobs if j.state is JobState.RUNNING]
-    rm_jobs = [j for j in r_jobs if j.type is JobType.MALLEABLE]
-    f_nodes = [n for n in nodes if n.state is NodeState.FREE]
+    state.update(jobs, nodes)
+    if state.is_unchanged(system, agreements):  # no decision possible, see StateIndex
+        return
+    p_jobs = state.get_pending_jobs()
+    r_jobs = state.get_running_jobs()
+    rm_jobs = ReconfigurationCost.get_resizable_jobs(state.get_running_malleable_jobs())
+    f_nodes = state.get_free_nodes()
 
     # schedule jobs with agreements first
-    agreements.resolve_agreements(p_jobs, f_nodes)
+    with Profiler.phase("resolve_agreements"):
+        agreements.resolve_agreements(p_jobs, f_nodes)
+        agreements.resolve_partial_agreements(r_jobs, f_nodes)
+        agreements.cancel_agreements(p_jobs, f_nodes)
 
     # remove pending jobs and free nodes with existing agreements
-    free_nodes = [n for n in f_nodes if not agreements.has_agreement(n)]
+    free_nodes = state.get_free_node_set(agreements.get_unavailable_nodes())
     pending_jobs = [j for j in p_jobs if not agreements.has_agreement(j)]
 
     # schedule initial allocation
     initial_allocation(pending_jobs, r_jobs, free_nodes, system)
 
+    # run pending jobs on idle agreement nodes if they end before the agreement is due
+    agreements.lend_nodes(pending_jobs, f_nodes, float(system["time"]))
+
+    # pack running malleable jobs into arrays if enabled
+    arrays = PolicyArrays.create(rm_jobs, agreements)
+
     # schedule pending jobs by shrinking malleable jobs
     if len(pending_jobs) > 0 and len(rm_jobs) > 0:
-        schedule_pending_job(pending_jobs, rm_jobs, agreements)
+        schedule_pending_job(pending_jobs, rm_jobs, agreements, arrays)
 
     # expand running malleable jobs if possible
     if len(free_nodes) > 0 and len(rm_jobs) > 0:
-        expand_running_malleable_jobs(rm_jobs, free_nodes)
+        if expand_by_marginal_speedup:
+            max_target = arrays.num_nodes_max if arrays is not None else None
+            expand_jobs_by_marginal_speedup(rm_jobs, free_nodes, lambda j: j.num_nodes_max, arrays, max_target)
+        else:
+            expand_running_malleable_jobs(rm_jobs, free_nodes, arrays)
 
 
 if __name__ == "__main__":
@@ -163,3 +191,5 @@ if __name__ == "__main__":
     except Exception as e:
         print("\nScheduler Error for average_common_pool.py")
         raise e
+    finally:
+        Logger.close()
@@ -0,0 +1,148 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Scheduling Algorithm Conservative Backfilling:
+# every pending job gets a reservation in order of their submission time, jobs are only backfilled if they do not
+# delay any reservation. Reservations are kept in an availability profile between invocations and are only
+# recalculated if running jobs end earlier or later than estimated.
+# Jobs are assigned with their pref amount of nodes and will not be reassigned
+
+from extension.ElastiSimExtension import *
+from extension.StateIndex import StateIndex
+from extension.AvailabilityProfile import AvailabilityProfile
+from elastisim_python import JobState, NodeState, pass_algorithm
+from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode
+
+
+state = StateIndex()
+profile = None
+reservations = dict()  # pending job id -> (start time, end time, node amount)
+running = dict()  # running job id -> (estimated end time, node amount)
+
+
+# reserves the earliest slot of the profile for the given job, returns False if the job can never start
+def reserve(job, time):
+    duration = job.get_estimated_runtime(job.num_nodes_pref)
+    start = profile.earliest_start(job.num_nodes_pref, duration, time)
+    if start is None:
+        return False
+    profile.reserve(start, start + duration, job.num_nodes_pref)
+    reservations[job.identifier] = (start, start + duration, job.num_nodes_pref)
+    return True
+
+
+# builds the profile from the running jobs and reserves all pending jobs again
+@Profiler.profile("rebuild_profile")
+def rebuild_profile(r_jobs, p_jobs, nodes, time):
+    global profile
+    profile = AvailabilityProfile(len(nodes), time)
+    reservations.clear()
+    running.clear()
+    for job in r_jobs:
+        end_time = time + job.get_remaining_runtime()
+        running[job.identifier] = (end_time, len(job.assigned_nodes))
+        profile.reserve(time, end_time, len(job.assigned_nodes))
+    for job in p_jobs:
+        reserve(job, time)
+
+
+# moves reservations to an earlier start if running jobs ended earlier than estimated
+# a job can only start earlier if enough nodes are free at some time before its reservation (its own reservation
+# does not cover that time), all other reservations stay where they are
+def compress_reservations(p_jobs, time):
+    for job in p_jobs:
+        if job.identifier not in reservations:
+            continue
+        start, end, node_amount = reservations[job.identifier]
+        if start > time and profile.max_free(time, start) < node_amount:
+            continue
+        del reservations[job.identifier]
+        profile.release(max(start, time), end, node_amount)
+        reserve(job, time)
+
+
+# updates the profile with the changes since the last invocation
+# returns True if the profile no longer matches the running jobs and has to be rebuilt
+@Profiler.profile("update_profile")
+def update_profile(r_jobs, p_jobs, time):
+    running_ids = {j.identifier for j in r_jobs}
+    pending_ids = {j.identifier for j in p_jobs}
+    compress = False
+    for job_id in [j_id for j_id in reservations if j_id not in pending_ids]:
+        start, end, node_amount = reservations.pop(job_id)
+        profile.release(max(start, time), end, node_amount)
+        compress = True
+
+    for job_id in [j_id for j_id in running if j_id not in running_ids]:
+        end_time, node_amount = running.pop(job_id)
+        if end_time > time:  # ended earlier than estimated
+            profile.release(time, end_time, node_amount)
+            compress = True
+
+    for job in r_jobs:
+        if job.identifier not in running:
+            return True
+        end_time, node_amount = running[job.identifier]
+        if end_time <= time or node_amount != len(job.assigned_nodes):  # runs longer than estimated
+            return True
+
+    profile.advance(time)
+    if compress:
+        compress_reservations(p_jobs, time)
+    for job in p_jobs:
+        if job.identifier not in reservations:
+            reserve(job, time)
+    return False
+
+
+@Recorder.record_invocation
+@Profiler.profile_invocation
+def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
+    injectExtension(jobs, nodes, system)
+    global state, profile
+    time = float(system["time"])
+    state.update(jobs, nodes)
+    if state.is_unchanged(system):  # no decision possible, see StateIndex
+        return
+    free_nodes = state.get_free_node_set()
+    p_jobs = state.get_pending_jobs()
+    r_jobs = state.get_running_jobs()
+
+    if profile is None or update_profile(r_jobs, p_jobs, time):
+        rebuild_profile(r_jobs, p_jobs, nodes, time)
+
+    # start all jobs whose reservation starts now
+    for job in p_jobs:
+        if job.identifier not in reservations:
+            continue
+        start, end, node_amount = reservations[job.identifier]
+        if start > time or node_amount > len(free_nodes):
+            continue
+
+        job.assign(free_nodes.allocate(node_amount))
+        job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
+        del reservations[job.identifier]
+        running[job.identifier] = (end, node_amount)
+        Logger.log_event(EventType.START, job, job.assigned_nodes)
+
+    # the profile changes when a reservation is due or a running job reaches its estimated end
+    due_times = [start for start, _, _ in reservations.values()] + [end for end, _ in running.values()]
+    state.set_expiry(min(due_times, default=float("inf")))
+
+
+if __name__ == "__main__":
+    url = "ipc:///tmp/elastisim.ipc"
+    try:
+        pass_algorithm(schedule, url)
+    except Exception as e:
+        print("\nScheduler Error for conservative_backfill.py")
+        raise e
+    finally:
+        Logger.close()
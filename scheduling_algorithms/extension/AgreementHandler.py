@@ -9,39 +9,363 @@
 # SPDX-License-Identifier: EPL-2.0
 # ---------------------------------------------------------------------
 from extension.ElastiSimExtension import *
+from extension.ReconfigurationCost import ReconfigurationCost
+from itertools import islice
+import bisect
+
+
+# removes the items with the given keys from a list in place, binary search if the list is sorted by key
+def remove_sorted(items: list, keys, key):
+    for k in keys:
+        i = bisect.bisect_left(items, k, key=key)
+        if i < len(items) and key(items[i]) == k:
+            del items[i]
+            continue
+        for i, item in enumerate(items):  # not sorted by key
+            if key(item) == k:
+                del items[i]
+                break
 
 
 # Used to enable asynchronous node reassignment
+# With lending enabled, idle agreement nodes run other pending jobs that end before the agreement is due
+# With partial_start enabled, malleable jobs start as soon as num_nodes_min of their agreement nodes are free
+# and are expanded by the remaining agreement nodes once they are free
+# With cancellation enabled, jobs start on free nodes without agreement if possible and give up their agreement
+# The free agreement nodes and the outstanding node amount of every job are kept across invocations, keyed by ids.
+# They are updated on add, drop and assign and, with the StateIndex of the scheduler, once per invocation from the
+# nodes that were freed or taken since the last invocation, so neither the agreement nodes nor the free nodes are scanned.
 class AgreementHandler:
-    def __init__(self):
-        self.job_dict = dict()
-        self.node_dict = dict()
+    def __init__(self, lending=False, partial_start=False, cancellation=False, state=None):
+        self.job_dict = dict()  # job id -> ids of its agreement nodes
+        self.node_dict = dict()  # node id -> id of the job waiting for the node, reverse index of job_dict
+        self.state = state  # StateIndex of the scheduler, optional
+        self.lending = lending
+        self.partial_start = partial_start
+        self.cancellation = cancellation
+        self.partial_jobs = set()  # ids of running jobs that still wait for agreement nodes
+        self.partial_started = set()  # ids of the partial jobs started in the current invocation
+        self.release_times = dict()  # job id -> predicted time all agreement nodes are free, None if unknown
+        self.lent_nodes = dict()  # node id -> id of the job running on the idle agreement node
+        self.version = 0  # incremented on every change of the agreements or lent nodes, see get_fingerprint
+        # free agreement nodes, see index_free_nodes
+        self.free_index = dict()  # node id -> Node of the nodes free at the start of the invocation, without state
+        self.taken_nodes = set()  # ids of the free nodes assigned in the current invocation
+        self.free_agreement_nodes = dict()  # node id -> Node in order of the node ids
+        self.unsorted = False  # free_agreement_nodes is not in order of the node ids
+        self.nodes_seen = None  # nodes list of the Node objects in free_agreement_nodes
+        self.freed_job_nodes = dict()  # job id -> {node id -> Node} of its free agreement nodes
+        self.outstanding = dict()  # job id -> amount of its agreement nodes that are not free yet
+        self.free_nodes = dict()  # all free nodes, only used by PoolAgreementHandler
+        self.started_jobs = set()
+        self.used_nodes = set()
+
+    # Checks if a node is free and not assigned in the current invocation
+    def is_free(self, node_id):
+        if self.state is not None:
+            return self.state.is_free(node_id) and node_id not in self.taken_nodes
+        return node_id in self.free_index and node_id not in self.taken_nodes
+
+    # Marks a free agreement node as free, the order of the node ids is restored by index_free_nodes
+    def add_free_agreement_node(self, node_id, node):
+        if len(self.free_agreement_nodes) > 0 and node_id < next(reversed(self.free_agreement_nodes)):
+            self.unsorted = True
+        self.free_agreement_nodes[node_id] = node
+
+    # Marks a free agreement node as not free, e.g. because it is assigned
+    def unfree_node(self, node_id):
+        job_id = self.node_dict.get(node_id)
+        if job_id in self.freed_job_nodes and self.freed_job_nodes[job_id].pop(node_id, None) is not None:
+            self.outstanding[job_id] += 1
+        self.free_agreement_nodes.pop(node_id, None)
+
+    # Unties a node from the agreement of job_id
+    def unbind_node(self, job_id, node_id):
+        self.version += 1
+        if self.node_dict.get(node_id) == job_id:
+            self.node_dict.pop(node_id)
+        if node_id in self.job_dict[job_id]:
+            self.job_dict[job_id].discard(node_id)
+            if self.freed_job_nodes[job_id].pop(node_id, None) is None:
+                self.outstanding[job_id] -= 1
+            else:
+                self.free_agreement_nodes.pop(node_id, None)
 
     # Adds an agreement to resolve later
-    def add_agreement(self, job: Job, nodes: list[Node]):
-        if job.identifier not in self.job_dict:
-            self.job_dict[job.identifier] = set()
-        self.job_dict[job.identifier].update({n.identifier for n in nodes})
+    # release_time is the predicted time the nodes are given up, e.g. the next scheduling point of the shrunk job
+    def add_agreement(self, job: Job, nodes: list[Node], release_time=None):
+        self.version += 1
+        job_id = job.identifier
+        if job_id not in self.job_dict:
+            self.job_dict[job_id] = set()
+            self.freed_job_nodes[job_id] = dict()
+            self.outstanding[job_id] = 0
+            self.release_times[job_id] = release_time
+        elif release_time is None or self.release_times[job_id] is None:
+            self.release_times[job_id] = None
+        else:
+            self.release_times[job_id] = max(self.release_times[job_id], release_time)
         for node in nodes:
-            self.node_dict[node.identifier] = job.identifier
+            node_id = node.identifier
+            if node_id in self.job_dict[job_id]:
+                continue
+            self.job_dict[job_id].add(node_id)
+            self.node_dict[node_id] = job_id
+            if self.is_free(node_id):
+                self.freed_job_nodes[job_id][node_id] = node
+                self.add_free_agreement_node(node_id, node)
+            else:
+                self.outstanding[job_id] += 1
+
+    # Adds an agreement for a running malleable job, it is expanded by the nodes once they are free
+    # see resolve_partial_agreements
+    def add_expand_agreement(self, job: Job, nodes: list[Node], release_time=None):
+        self.add_agreement(job, nodes, release_time)
+        self.partial_jobs.add(job.identifier)
 
     # Removes an agreement
     def remove_agreement(self, job: Job, node_ids=None):
         if job.identifier in self.job_dict:
+            self.version += 1
             node_ids = node_ids or self.job_dict.pop(job.identifier)
+            self.release_times.pop(job.identifier, None)
+            self.freed_job_nodes.pop(job.identifier, None)
+            self.outstanding.pop(job.identifier, None)
             for node_id in node_ids:
                 self.node_dict.pop(node_id)
+                self.free_agreement_nodes.pop(node_id, None)
+
+    # Removes the given nodes from the agreement of the job, the agreement is removed once it has no nodes left
+    def remove_agreement_nodes(self, job_id, nodes: list[Node]):
+        for node in nodes:
+            self.unbind_node(job_id, node.identifier)
+        if len(self.job_dict[job_id]) == 0:
+            self.drop_agreement(job_id)
+
+    # Removes the agreement of a job with all its nodes, e.g. if the job is no longer waiting for them
+    def drop_agreement(self, job_id):
+        if job_id in self.job_dict or job_id in self.partial_jobs:
+            self.version += 1
+        for node_id in self.job_dict.pop(job_id, ()):
+            if self.node_dict.get(node_id) == job_id:
+                self.node_dict.pop(node_id)
+                self.free_agreement_nodes.pop(node_id, None)
+        self.freed_job_nodes.pop(job_id, None)
+        self.outstanding.pop(job_id, None)
+        self.release_times.pop(job_id, None)
+        self.partial_jobs.discard(job_id)
+
+    # Refreshes the free agreement nodes once per invocation, nodes are freed and taken outside of the handler
+    # with a StateIndex only the agreement nodes that were freed or taken since the last invocation and the nodes
+    # assigned in the last invocation are checked, every freed node lowers the outstanding amount of its job by one
+    def index_free_nodes(self, f_nodes: list[Node]):
+        changed_nodes = self.state.take_changed_nodes() if self.state is not None else None
+        taken_nodes, self.taken_nodes = self.taken_nodes, set()
+        if changed_nodes is None:
+            self.rebuild_free_nodes(f_nodes)
+            return
+
+        is_free, get_node = self.state.is_free, self.state.get_node
+        for node_id in changed_nodes.union(taken_nodes).intersection(self.node_dict):
+            job_id = self.node_dict[node_id]
+            if not is_free(node_id):
+                self.unfree_node(node_id)
+            elif node_id not in self.freed_job_nodes[job_id]:
+                node = get_node(node_id)
+                self.freed_job_nodes[job_id][node_id] = node
+                self.outstanding[job_id] -= 1
+                self.add_free_agreement_node(node_id, node)
+        if self.unsorted:
+            self.free_agreement_nodes = dict(sorted(self.free_agreement_nodes.items()))
+            self.unsorted = False
+
+        # ElastiSim passes new Node objects on every invocation
+        if self.state.nodes is not self.nodes_seen:
+            self.nodes_seen = self.state.nodes
+            for node_id in self.free_agreement_nodes:
+                node = get_node(node_id)
+                self.free_agreement_nodes[node_id] = node
+                self.freed_job_nodes[self.node_dict[node_id]][node_id] = node
+
+    # Finds the free agreement nodes by looking up all agreement nodes in the free nodes, node_dict maps every
+    # free agreement node to its waiting job
+    def rebuild_free_nodes(self, f_nodes: list[Node]):
+        if self.state is not None:
+            self.nodes_seen = self.state.nodes
+            free_index = {nid: self.state.get_node(nid) for nid in self.node_dict if self.state.is_free(nid)}
+        else:
+            self.free_index = free_index = {n.identifier: n for n in f_nodes}
+        self.free_agreement_nodes = dict()
+        self.unsorted = False
+        self.freed_job_nodes = {job_id: dict() for job_id in self.job_dict}
+        for node_id in sorted(nid for nid in self.node_dict if nid in free_index):
+            node = free_index[node_id]
+            self.free_agreement_nodes[node_id] = node
+            self.freed_job_nodes[self.node_dict[node_id]][node_id] = node
+        self.outstanding = {
+            job_id: len(node_ids) - len(self.freed_job_nodes[job_id]) for job_id, node_ids in self.job_dict.items()
+        }
+
+    # Returns the ids of the free nodes that are not available to the scheduler,
+    # the free agreement nodes and the nodes assigned in the current invocation
+    def get_unavailable_nodes(self):
+        return list(self.free_agreement_nodes) + list(self.taken_nodes)
+
+    # Returns the amount of agreement nodes of the job that are not free yet
+    def get_outstanding_nodes(self, job: Job):
+        return self.outstanding[job.identifier]
+
+    # Returns the free agreement nodes of the job in order of the node ids
+    def get_freed_nodes(self, job_id):
+        return sorted(self.freed_job_nodes.get(job_id, dict()).values(), key=lambda n: n.identifier)
+
+    # Returns the pending jobs that wait for an agreement in order of p_jobs
+    def get_waiting_jobs(self, p_jobs: list[Job]):
+        if len(self.job_dict) == 0:
+            return []
+        if self.state is not None:
+            return self.state.select_pending_jobs(self.job_dict)
+        return [j for j in p_jobs if j.identifier in self.job_dict]
 
     # Applies the agreement by starting the job with the specified amount of nodes
+    # the job and nodes are removed from p_jobs and f_nodes by remove_started
     def apply_agreement(self, job_to_start, nodes_to_assign, p_jobs, f_nodes, node_ids_to_remove=None):
         job_to_start.assign(nodes_to_assign)
         job_to_start.assign_num_gpus_per_node(job_to_start.num_gpus_per_node_max)
 
-        p_jobs.remove(job_to_start)
+        self.started_jobs.add(job_to_start.identifier)
         for node in nodes_to_assign:
-            f_nodes.remove(node)
+            self.used_nodes.add(node.identifier)
+            self.taken_nodes.add(node.identifier)
+            self.free_nodes.pop(node.identifier, None)
+            self.unfree_node(node.identifier)
         Logger.log_event(EventType.AGREEMENT_FULLFILLED, job_to_start, job_to_start.assigned_nodes)
 
+    # Starts a malleable job with its free agreement nodes, the other agreement nodes stay bound to the job
+    def apply_partial_agreement(self, job: Job, p_jobs: list[Job], f_nodes: list[Node]):
+        nodes_to_assign = self.get_freed_nodes(job.identifier)[:job.num_nodes_max]
+        self.apply_agreement(job, nodes_to_assign, p_jobs, f_nodes)
+        self.remove_agreement_nodes(job.identifier, nodes_to_assign)
+        if job.identifier in self.job_dict:
+            self.version += 1
+            self.partial_jobs.add(job.identifier)
+            self.partial_started.add(job.identifier)
+
+    # Expands partially started jobs by their agreement nodes that are free now
+    # the agreement is dropped if the job has ended or reached num_nodes_max
+    # jobs started in this invocation are not part of r_jobs yet, they keep their agreement until the next invocation
+    # jobs within their dwell time keep the free nodes until they may resize, if the expand does not pay off
+    # (see ReconfigurationCost) the free nodes are released
+    def resolve_partial_agreements(self, r_jobs: list[Job], f_nodes: list[Node]):
+        started_jobs = self.partial_started
+        self.partial_started = set()
+        if len(self.partial_jobs) == 0:
+            return
+        running_jobs = {j.identifier: j for j in r_jobs if j.identifier in self.partial_jobs}
+        for job_id in [jid for jid in self.partial_jobs if jid not in running_jobs and jid not in started_jobs]:
+            self.drop_agreement(job_id)
+
+        for job_id, job in running_jobs.items():
+            nodes = self.get_freed_nodes(job_id)
+            if len(nodes) == 0 or not ReconfigurationCost.may_resize(job):
+                continue
+            nodes_to_assign = nodes[:max(0, job.num_nodes_max - len(job.assigned_nodes))]
+            if len(nodes_to_assign) > 0 and ReconfigurationCost.is_worth_expand(job, len(nodes_to_assign)):
+                job.assign(nodes_to_assign)
+                for node in nodes_to_assign:
+                    self.used_nodes.add(node.identifier)
+                    self.taken_nodes.add(node.identifier)
+                    self.unfree_node(node.identifier)
+                Logger.log_event(EventType.EXPAND, job, nodes_to_assign)
+            self.remove_agreement_nodes(job_id, nodes)
+            if len(job.assigned_nodes) >= job.num_nodes_max:
+                self.drop_agreement(job_id)
+        self.remove_started([], f_nodes)
+
+    # Starts waiting jobs if their free agreement nodes and free nodes without agreement suffice
+    # the agreement is cancelled, its nodes that are not free yet will be used like any other node once they are free
+    def cancel_agreements(self, p_jobs: list[Job], f_nodes: list[Node]):
+        if not self.cancellation:
+            return
+        unreserved_nodes = [n for n in f_nodes if n.identifier not in self.node_dict]
+        if len(unreserved_nodes) == 0:
+            return
+        freed_job_nodes = dict()
+        for node in f_nodes:
+            if node.identifier in self.node_dict:
+                freed_job_nodes.setdefault(self.node_dict[node.identifier], []).append(node)
+
+        for job in [j for j in p_jobs if self.has_agreement(j)]:
+            if len(unreserved_nodes) == 0:
+                break
+            agreement_nodes = freed_job_nodes.get(job.identifier, [])
+            missing_node_amount = len(self.get_job_agreement_nodes(job)) - len(agreement_nodes)
+            if missing_node_amount > len(unreserved_nodes):
+                continue
+
+            nodes_to_assign = agreement_nodes + unreserved_nodes[:missing_node_amount]
+            del unreserved_nodes[:missing_node_amount]
+            job.assign(nodes_to_assign)
+            job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
+            self.started_jobs.add(job.identifier)
+            self.used_nodes.update(n.identifier for n in nodes_to_assign)
+            self.taken_nodes.update(n.identifier for n in nodes_to_assign)
+            self.drop_agreement(job.identifier)
+            Logger.log_event(EventType.START, job, job.assigned_nodes)
+        self.remove_started(p_jobs, f_nodes)
+
+    # Removes all started jobs and their nodes from p_jobs and f_nodes
+    # both lists are in order of the ids, so only the started jobs and used nodes are searched
+    def remove_started(self, p_jobs: list[Job], f_nodes: list[Node]):
+        if len(self.started_jobs) == 0 and len(self.used_nodes) == 0:
+            return
+        remove_sorted(p_jobs, sorted(self.started_jobs), lambda j: j.identifier)
+        remove_sorted(f_nodes, sorted(self.used_nodes), lambda n: n.identifier)
+        self.started_jobs.clear()
+        self.used_nodes.clear()
+
+    # Starts pending jobs on free agreement nodes if they are estimated to end before the agreement is due
+    # every job is started with num_nodes_min on the nodes whose agreement is due the earliest after its end
+    def lend_nodes(self, p_jobs: list[Job], f_nodes: list[Node], time: float):
+        if not self.lending:
+            return
+        for node_id in [nid for nid in self.lent_nodes if nid not in self.node_dict or self.is_free(nid)]:
+            self.lent_nodes.pop(node_id)  # the agreement is resolved or the job running on the lent node has finished
+            self.version += 1
+
+        lendable = sorted(
+            (self.release_times[self.node_dict[nid]], nid, n)
+            for nid, n in self.free_agreement_nodes.items()
+            if self.release_times[self.node_dict[nid]] is not None
+        )
+        due_times = [due for due, _, _ in lendable]
+        for job in p_jobs:
+            if len(lendable) == 0:
+                break
+            req_nodes = job.num_nodes_min
+            first = bisect.bisect_left(due_times, time + job.get_estimated_runtime(req_nodes))
+            if len(lendable) - first < req_nodes:
+                continue
+
+            nodes_to_assign = [n for _, _, n in sorted(lendable[first:first + req_nodes], key=lambda e: e[1])]
+            del lendable[first:first + req_nodes]
+            del due_times[first:first + req_nodes]
+            job.assign(nodes_to_assign)
+            job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
+            self.started_jobs.add(job.identifier)
+            self.version += 1
+            for node in nodes_to_assign:
+                self.used_nodes.add(node.identifier)
+                self.taken_nodes.add(node.identifier)
+                self.unfree_node(node.identifier)
+                self.lent_nodes[node.identifier] = job.identifier
+            Logger.log_event(EventType.START, job, job.assigned_nodes)
+        self.remove_started(p_jobs, f_nodes)
+
+    # Checks if a node with agreement currently runs another job
+    def is_lent(self, node: Node):
+        return node.identifier in self.lent_nodes
+
     # Method to resolve the agreement, different strategies are provided below
     def resolve_agreements(self, p_jobs: list[Job], f_nodes: list[Node]):
         raise NotImplementedError("abstract method")
@@ -59,22 +383,33 @@ class AgreementHandler:
     def get_job_agreement_nodes(self, job: Job):
         return self.job_dict[job.identifier]
 
+    # Returns the state of the agreements, equal fingerprints mean that the agreements and lent nodes did not change
+    def get_fingerprint(self):
+        return self.version
+
 
 # Resolves the agreement exactly in the order and assignment they are stored in
 class DirectAgreementHandler(AgreementHandler):
     def resolve_agreements(self, p_jobs: list[Job], f_nodes: list[Node]):
-        target_jobs = [j for j in p_jobs if self.has_agreement(j)]
-        for job in target_jobs:
-            free_agreement_nodes = [n for n in f_nodes if n.identifier in self.job_dict[job.identifier]]
-            if len(self.get_job_agreement_nodes(job)) == len(free_agreement_nodes):
-                self.apply_agreement(job, free_agreement_nodes, p_jobs, f_nodes)
+        self.index_free_nodes(f_nodes)
+        for job in self.get_waiting_jobs(p_jobs):
+            if self.get_outstanding_nodes(job) == 0:
+                self.apply_agreement(job, self.get_freed_nodes(job.identifier), p_jobs, f_nodes)
                 self.remove_agreement(job)
+            elif (
+                self.partial_start
+                and job.type is JobType.MALLEABLE
+                and len(self.freed_job_nodes[job.identifier]) >= job.num_nodes_min
+            ):
+                self.apply_partial_agreement(job, p_jobs, f_nodes)
+        self.remove_started(p_jobs, f_nodes)
 
 
 # Resolves the agreement exactly in the order and assignment they are stored in
 # Allows a job to used free nodes of other jobs with assignment by stealing them
 class StealAgreementHandler(AgreementHandler):
     def swap_nodes(self, node1_id, node2_id):
+        self.version += 1
         job1_id = self.node_dict[node1_id]
         job2_id = self.node_dict[node2_id]
         # swap nodes
@@ -85,29 +420,42 @@ class StealAgreementHandler(AgreementHandler):
         # swap jobs
         self.node_dict[node1_id] = job2_id
         self.node_dict[node2_id] = job1_id
+        # swap free nodes and outstanding amounts
+        node1 = self.freed_job_nodes[job1_id].pop(node1_id, None)
+        node2 = self.freed_job_nodes[job2_id].pop(node2_id, None)
+        if node1 is not None:
+            self.freed_job_nodes[job2_id][node1_id] = node1
+        if node2 is not None:
+            self.freed_job_nodes[job1_id][node2_id] = node2
+        self.outstanding[job1_id] += (node1 is not None) - (node2 is not None)
+        self.outstanding[job2_id] += (node2 is not None) - (node1 is not None)
 
-    def steal_agreement_nodes(self, job: Job, free_agreement_nodes: list[Node]):
+    # swaps the not yet free agreement nodes of the job with the first free agreement nodes of other jobs
+    def steal_agreement_nodes(self, job: Job, free_agreement_nodes: dict):
         agree_node_ids = self.job_dict[job.identifier]
-        free_agreement_node_ids = [n.identifier for n in free_agreement_nodes]
-        used_agree_node_ids = [nid for nid in agree_node_ids if nid not in free_agreement_node_ids]
-        free_other_agree_node_ids = [nid for nid in free_agreement_node_ids if nid not in agree_node_ids]
+        used_agree_node_ids = [nid for nid in agree_node_ids if nid not in free_agreement_nodes]
+        free_other_agree_node_ids = (nid for nid in free_agreement_nodes if nid not in agree_node_ids)
 
         # steal/swap nodes
         for used_node_id, free_other_node_id in zip(used_agree_node_ids, free_other_agree_node_ids):
             self.swap_nodes(used_node_id, free_other_node_id)
 
     def resolve_agreements(self, p_jobs: list[Job], f_nodes: list[Node]):
-        target_jobs = [j for j in p_jobs if self.has_agreement(j)]
-        for job in target_jobs:
-            free_agreement_nodes = [n for n in f_nodes if self.has_agreement(n)]
-            if len(free_agreement_nodes) == 0:
+        self.index_free_nodes(f_nodes)
+        position = {nid: i for i, nid in enumerate(self.free_agreement_nodes)}
+        for job in self.get_waiting_jobs(p_jobs):
+            if len(self.free_agreement_nodes) == 0:
                 break
 
-            if len(self.get_job_agreement_nodes(job)) <= len(free_agreement_nodes):
-                self.steal_agreement_nodes(job, free_agreement_nodes)
-                nodes_to_assign = [n for n in free_agreement_nodes if n.identifier in self.get_job_agreement_nodes(job)]
+            if len(self.get_job_agreement_nodes(job)) <= len(self.free_agreement_nodes):
+                self.steal_agreement_nodes(job, self.free_agreement_nodes)
+                nodes_to_assign = sorted(
+                    (self.free_agreement_nodes[nid] for nid in self.get_job_agreement_nodes(job)),
+                    key=lambda n: position[n.identifier],
+                )
                 self.apply_agreement(job, nodes_to_assign, p_jobs, f_nodes)
                 self.remove_agreement(job)
+        self.remove_started(p_jobs, f_nodes)
 
 
 # Resolves the agreement by using all available free nodes
@@ -141,36 +489,111 @@ class TEMPPoolAgreementHandler(AgreementHandler):
             if len(self.get_job_agreement_nodes(job)) <= len(f_nodes):
                 nodes_to_assign, node_ids_to_remove = self.get_nodes_from_pool(job, f_nodes)
                 self.apply_agreement(job, nodes_to_assign, p_jobs, f_nodes, node_ids_to_remove)
+                self.remove_started(p_jobs, f_nodes)
 
 
 # Resolves the agreement by using all available free nodes
 # Allows a job to used free nodes that do not have an agreement
 class PoolAgreementHandler(AgreementHandler):
-    def get_nodes_from_pool(self, job: Job, free_nodes: list[Node]):
-        free_nodes_with_agreement = [n for n in free_nodes if n.identifier in self.node_dict]
-        free_node_ids_with_agreement = [n.identifier for n in free_nodes_with_agreement]
-        free_nodes_without_agreement = [n for n in free_nodes if n not in free_nodes_with_agreement]
+    def get_nodes_from_pool(self, job: Job):
         nodes_needed = len(self.get_job_agreement_nodes(job))
 
         # use free agreement nodes and if required free nodes without agreement
-        nodes_to_assign = free_nodes_with_agreement[:nodes_needed]
-        nodes_to_assign += free_nodes_without_agreement[:max(0, nodes_needed - len(nodes_to_assign))]
+        nodes_to_assign = list(islice(self.free_agreement_nodes.values(), nodes_needed))
+        agreement_node_amount = len(nodes_to_assign)
+        free_nodes_without_agreement = (
+            n for nid, n in self.free_nodes.items() if nid not in self.free_agreement_nodes
+        )
+        nodes_to_assign += islice(free_nodes_without_agreement, max(0, nodes_needed - agreement_node_amount))
 
-        # remove job/node agreemnet
-        self.job_dict.pop(job.identifier)
-        for node in nodes_to_assign:
-            if node.identifier in free_node_ids_with_agreement:
-                self.node_dict.pop(node.identifier)
+        # remove job/node agreemnet, one agreement node is given up for every assigned node:
+        # the assigned agreement nodes and the latest agreement node for every node without agreement
+        job_id = job.identifier
+        job_node_ids = self.job_dict.pop(job_id)
+        self.version += 1
+        self.release_times.pop(job_id, None)
+        self.freed_job_nodes.pop(job_id, None)
+        self.outstanding.pop(job_id, None)
+        removed_node_ids = [n.identifier for n in nodes_to_assign[:agreement_node_amount]]
+        owners = [self.give_up_node(node_id, job_id) for node_id in removed_node_ids]
+        for _ in nodes_to_assign[agreement_node_amount:]:
+            removed_node_ids.append(next(reversed(self.node_dict)))  # latest agreement node
+            owners.append(self.give_up_node(removed_node_ids[-1], job_id))
+
+        # the remaining agreement nodes of the job replace the nodes given up by other jobs,
+        # so every job keeps its amount of agreement nodes
+        remaining_node_ids = sorted(job_node_ids.difference(removed_node_ids))
+        for owner, node_id in zip((o for o in owners if o != job_id), remaining_node_ids):
+            self.node_dict[node_id] = owner
+            self.job_dict[owner].add(node_id)
+            if node_id in self.free_agreement_nodes:
+                self.freed_job_nodes[owner][node_id] = self.free_agreement_nodes[node_id]
             else:
-                self.node_dict.popitem()
+                self.outstanding[owner] += 1
         return nodes_to_assign
 
+    # Removes an agreement node given up for job_id, returns the job it was bound to
+    def give_up_node(self, node_id, job_id):
+        owner = self.node_dict.pop(node_id)
+        self.free_agreement_nodes.pop(node_id, None)
+        if owner != job_id:
+            self.job_dict[owner].discard(node_id)
+            if self.freed_job_nodes[owner].pop(node_id, None) is None:
+                self.outstanding[owner] -= 1
+        return owner
+
     def resolve_agreements(self, p_jobs: list[Job], f_nodes: list[Node]):
-        target_jobs = [j for j in p_jobs if self.has_agreement(j)]
+        self.index_free_nodes(f_nodes)
+        target_jobs = self.get_waiting_jobs(p_jobs)
+        self.free_nodes = {n.identifier: n for n in f_nodes} if len(target_jobs) > 0 else dict()
         for job in target_jobs:
-            if len(f_nodes) == 0:
+            if len(self.free_nodes) == 0:
                 break
 
-            if len(self.get_job_agreement_nodes(job)) <= len(f_nodes):
-                nodes_to_assign = self.get_nodes_from_pool(job, f_nodes)
+            if len(self.get_job_agreement_nodes(job)) <= len(self.free_nodes):
+                nodes_to_assign = self.get_nodes_from_pool(job)
                 self.apply_agreement(job, nodes_to_assign, p_jobs, f_nodes)
+        self.remove_started(p_jobs, f_nodes)
+
+
+# Resolves the agreements of all waiting jobs together
+# Free agreement nodes are interchangeable by swapping, so the most jobs start if the jobs with the fewest agreement
+# nodes are selected first (ties in order of p_jobs). Selected jobs keep their own free nodes and steal the missing
+# ones only from jobs that can not start, which keeps the amount of swapped nodes minimal.
+class GlobalStealAgreementHandler(StealAgreementHandler):
+    # selects the jobs that can start with the free agreement nodes
+    def select_jobs(self, target_jobs: list[Job]):
+        free_node_amount = len(self.free_agreement_nodes)
+        selected_jobs = []
+        for job in sorted(target_jobs, key=lambda j: len(self.get_job_agreement_nodes(j))):
+            if len(self.get_job_agreement_nodes(job)) > free_node_amount:
+                break
+            free_node_amount -= len(self.get_job_agreement_nodes(job))
+            selected_jobs.append(job)
+        return selected_jobs
+
+    def resolve_agreements(self, p_jobs: list[Job], f_nodes: list[Node]):
+        self.index_free_nodes(f_nodes)
+        position = {nid: i for i, nid in enumerate(self.free_agreement_nodes)}
+        target_jobs = self.get_waiting_jobs(p_jobs)
+        selected_jobs = self.select_jobs(target_jobs)
+        if len(selected_jobs) == 0:
+            return
+
+        # swap the used nodes of the selected jobs with free nodes of jobs that can not start
+        selected_ids = {j.identifier for j in selected_jobs}
+        donor_node_ids = (nid for nid in self.free_agreement_nodes if self.node_dict[nid] not in selected_ids)
+        for job in selected_jobs:
+            used_node_ids = [nid for nid in self.job_dict[job.identifier] if nid not in self.free_agreement_nodes]
+            for used_node_id, donor_node_id in zip(used_node_ids, donor_node_ids):
+                self.swap_nodes(used_node_id, donor_node_id)
+
+        # start the selected jobs in order of p_jobs
+        for job in [j for j in target_jobs if j.identifier in selected_ids]:
+            nodes_to_assign = sorted(
+                (self.free_agreement_nodes[nid] for nid in self.get_job_agreement_nodes(job)),
+                key=lambda n: position[n.identifier],
+            )
+            self.apply_agreement(job, nodes_to_assign, p_jobs, f_nodes)
+            self.remove_agreement(job)
+        self.remove_started(p_jobs, f_nodes)
@@ -0,0 +1,88 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import bisect
+
+
+# Skyline of free nodes over time in sorted lists, free[i] nodes are free from times[i] until times[i + 1] or forever
+class AvailabilityProfile:
+    def __init__(self, capacity: int, time: float):
+        self.capacity = capacity
+        self.times = [time]
+        self.free = [capacity]
+
+    def __len__(self):
+        return len(self.times)
+
+    # index of the segment that contains the given time
+    def __index(self, time):
+        return max(0, bisect.bisect_right(self.times, time) - 1)
+
+    # ensures a breakpoint at the given time and returns its index
+    def __split(self, time):
+        if time == float("inf"):
+            return len(self.times)
+        i = self.__index(time)
+        if self.times[i] == time:
+            return i
+        if time < self.times[i]:  # before the first breakpoint
+            self.times.insert(0, time)
+            self.free.insert(0, self.capacity)
+            return 0
+        self.times.insert(i + 1, time)
+        self.free.insert(i + 1, self.free[i])
+        return i + 1
+
+    # removes breakpoints that do not change the amount of free nodes
+    def __merge(self, first, last):
+        for i in range(min(last, len(self.times) - 1), max(first, 1) - 1, -1):
+            if self.free[i] == self.free[i - 1]:
+                del self.times[i]
+                del self.free[i]
+
+    def __change(self, start, end, amount):
+        first = self.__split(start)
+        last = self.__split(end)
+        for i in range(first, last):
+            self.free[i] += amount
+        self.__merge(first, last)
+
+    def reserve(self, start: float, end: float, node_amount: int):
+        self.__change(start, end, -node_amount)
+
+    def release(self, start: float, end: float, node_amount: int):
+        self.__change(start, end, node_amount)
+
+    def free_at(self, time: float):
+        return self.free[self.__index(time)]
+
+    # most free nodes at any time in [start, end)
+    def max_free(self, start: float, end: float):
+        first = self.__index(start)
+        return max(self.free[first:max(first + 1, bisect.bisect_left(self.times, end))])
+
+    # drops all breakpoints before the given time
+    def advance(self, time: float):
+        i = self.__index(time)
+        del self.times[:i]
+        del self.free[:i]
+        self.times[0] = max(self.times[0], time)
+
+    # earliest start time not before the given time with node_amount free nodes for the whole duration
+    # returns None if the profile never has enough free nodes
+    def earliest_start(self, node_amount: int, duration: float, time: float):
+        start = time
+        for i in range(self.__index(time), len(self.times)):
+            segment_end = self.times[i + 1] if i + 1 < len(self.times) else float("inf")
+            if self.free[i] < node_amount:
+                start = segment_end
+            elif segment_end >= start + duration:
+                return start
+        return None
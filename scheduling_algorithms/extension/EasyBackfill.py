@@ -0,0 +1,67 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import bisect
+
+
+# EASY backfilling for one scheduler invocation.
+# The shadow time (earliest start of the queue head) and the extra nodes (nodes still unused by the head at its
+# shadow time) are calculated once per head, afterwards every candidate is checked in O(1):
+# a candidate may start if it finishes before the shadow time or only uses extra nodes.
+# head_nodes returns the node amount the scheduler requests for the queue head, e.g. lambda j: j.num_nodes_pref
+class EasyBackfill:
+    def __init__(self, running_jobs, time: float, head_nodes=lambda j: j.num_nodes_min):
+        self.time = time
+        self.head_nodes = head_nodes
+        # (estimated end time, node amount) of all running jobs, sorted by end time
+        self.releases = sorted((self.__end_time(j), len(j.assigned_nodes)) for j in running_jobs)
+        self.head = None
+        self.shadow_time = time
+        self.extra_nodes = 0
+
+    def __end_time(self, job):
+        return self.time + job.get_remaining_runtime()
+
+    # calculates shadow time and extra nodes of a new queue head, the head needs head_nodes(head) to start
+    def __reserve(self, head, free_node_amount: int):
+        self.head = head
+        required_nodes = self.head_nodes(head)
+        available_nodes = free_node_amount
+        self.shadow_time = self.time
+        for end_time, node_amount in self.releases:
+            if available_nodes >= required_nodes:
+                break
+            available_nodes += node_amount
+            self.shadow_time = end_time
+
+        if available_nodes >= required_nodes:
+            self.extra_nodes = available_nodes - required_nodes
+        else:  # the head can not start with the known jobs, backfilling can not delay it
+            self.shadow_time = float("inf")
+            self.extra_nodes = 0
+
+    # checks if starting the job with req_nodes delays the queue head
+    def delays_head(self, job, req_nodes: int, head, free_node_amount: int):
+        if job is head:
+            return False
+        if head is not self.head:
+            self.__reserve(head, free_node_amount)
+        if self.time + job.get_estimated_runtime(req_nodes) <= self.shadow_time:
+            return False
+        return req_nodes > self.extra_nodes
+
+    # registers a started job, the next head is reserved on the following delays_head call
+    def start(self, job, req_nodes: int):
+        end_time = self.time + job.get_estimated_runtime(req_nodes)
+        bisect.insort(self.releases, (end_time, req_nodes))
+        if job is self.head:
+            self.head = None
+        elif end_time > self.shadow_time:
+            self.extra_nodes -= req_nodes
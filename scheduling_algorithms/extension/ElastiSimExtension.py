@@ -8,35 +8,169 @@
 #
 # SPDX-License-Identifier: EPL-2.0
 # ---------------------------------------------------------------------
-from .ElastiSimLogger import Logger, EventType
+from .ElastiSimLogger import Logger, EventType, Profiler, Recorder
 from elastisim_python import JobState, JobType, NodeState
 from elastisim_python import Job as ElastiSimJob
 from elastisim_python import Node as ElastiSimNode
 
 
+# speedup of a job on num_nodes, same amdahl formula as the scaling_formula written by jsonGenerator.py
+def get_amdahl_speedup(parallel_percentage, num_nodes):
+    return 1 / ((1 - parallel_percentage) + parallel_percentage / num_nodes)
+
+
+# ids of a node or a list of nodes as passed to assign and remove
+def get_node_ids(nodes):
+    if isinstance(nodes, (list, tuple)):
+        return [node.identifier for node in nodes]
+    return [nodes.identifier]
+
+
+# compact record of the typed job values used by the schedulers, parsed once per job
+# also tracks the progress of the job in work units (flops of one node at speedup 1) across node changes
+class JobRecord:
+    __slots__ = (
+        "runtime", "work", "iterations", "flops", "parallel_percentage", "node_flops",
+        "num_nodes_pref", "num_nodes_min", "num_nodes_max",
+        "work_done", "progress_time", "progress_num_nodes", "resize_time", "resize_cost", "dwell_time",
+    )
+
+    def __init__(self, flops, parallel_percentage, node_flops, num_nodes_pref, num_nodes_min, num_nodes_max):
+        self.runtime = None
+        self.work = None
+        self.iterations = 1
+        self.flops = flops
+        self.parallel_percentage = parallel_percentage
+        self.node_flops = node_flops
+        self.num_nodes_pref = num_nodes_pref
+        self.num_nodes_min = num_nodes_min
+        self.num_nodes_max = num_nodes_max
+        self.work_done = 0.0
+        self.progress_time = None
+        self.progress_num_nodes = 0
+        self.resize_time = None
+        self.resize_cost = None  # None uses the default of ReconfigurationCost
+        self.dwell_time = None
+
+    # work units processed per second on num_nodes
+    def get_rate(self, num_nodes):
+        return get_amdahl_speedup(self.parallel_percentage, num_nodes) * self.node_flops if num_nodes > 0 else 0.0
+
+    # work done until the given time, assuming the node amount did not change since the last update
+    def get_work_done(self, time):
+        if self.progress_time is None:
+            return self.work_done
+        return self.work_done + self.get_rate(self.progress_num_nodes) * (time - self.progress_time)
+
+    def update_progress(self, time, num_nodes):
+        self.work_done = self.get_work_done(time)
+        self.progress_time = time
+        self.progress_num_nodes = num_nodes
+
+
 # extended job-class, adds runtime-argument and pref_node attribute, improves debug printing
 class Job(ElastiSimJob):
-    def get_estimated_runtime(self):
-        if "runtime" not in self.arguments:
-            flops = float(self.arguments["flops"])
-            iterations = float(self.arguments["iterations"]) if "iterations" in self.arguments else 1
-            self.arguments["runtime"] = (flops*iterations) / self.num_nodes_min
-        return float(self.arguments["runtime"])
+    records = dict()  # job id -> JobRecord, kept across invocations as ElastiSim may pass new job objects
+    node_flops = 100e9  # flops per second of one node if the job has no node_flops argument, see jsonGenerator.py
+    time = 0.0  # time of the current invocation
+    decisions = 0  # amount of assign and remove calls of all invocations
+    node_changes = []  # (job id, node ids, True if removed) of the assign and remove calls, see StateIndex
+
+    # estimated runtime on num_nodes, defaults to num_nodes_min
+    def get_estimated_runtime(self, num_nodes=None):
+        if num_nodes is None:
+            return self.record.runtime
+        return self.record.work / self.record.get_rate(num_nodes)
+
+    def get_speedup(self, num_nodes):
+        return get_amdahl_speedup(self.record.parallel_percentage, num_nodes)
+
+    # estimated remaining runtime with the currently assigned nodes
+    def get_remaining_runtime(self):
+        record = self.record
+        num_nodes = len(self.assigned_nodes)
+        if num_nodes == 0:
+            return record.runtime
+        if record.progress_time is None:  # started without this scheduler, assume it ran on its current nodes
+            record.update_progress(self.start_time, num_nodes)
+        remaining_work = max(0.0, record.work - record.get_work_done(Job.time))
+        return remaining_work / record.get_rate(num_nodes)
+
+    # estimated time of the next scheduling point, the end of the current iteration with the currently assigned nodes
+    # node changes of malleable jobs take effect at this time
+    def get_next_scheduling_point(self):
+        record = self.record
+        num_nodes = len(self.assigned_nodes)
+        if num_nodes == 0:
+            return Job.time
+        if record.progress_time is None:
+            record.update_progress(self.start_time, num_nodes)
+        work_done = min(record.get_work_done(Job.time), record.work)
+        iteration_work = record.work / record.iterations
+        remaining_work = min(iteration_work - work_done % iteration_work, record.work - work_done)
+        return Job.time + remaining_work / record.get_rate(num_nodes)
+
+    # tracks the progress before the node amount changes, expands and shrinks are recorded as resizes
+    def assign(self, nodes):
+        Job.decisions += 1
+        if len(self.assigned_nodes) > 0:
+            self.record.resize_time = Job.time
+        self.record.update_progress(Job.time, len(self.assigned_nodes))
+        super().assign(nodes)
+        self.record.progress_num_nodes = len(self.assigned_nodes)
+        Job.node_changes.append((self.identifier, get_node_ids(nodes), False))
+
+    def remove(self, nodes):
+        Job.decisions += 1
+        self.record.resize_time = Job.time
+        self.record.update_progress(Job.time, len(self.assigned_nodes))
+        super().remove(nodes)
+        self.record.progress_num_nodes = len(self.assigned_nodes)
+        Job.node_changes.append((self.identifier, get_node_ids(nodes), True))
+
+    def __create_record(self):
+        arguments = self.arguments
+        flops = float(arguments["flops"]) if "flops" in arguments else None
+        parallel_percentage = float(arguments["parallel_percentage"]) if "parallel_percentage" in arguments else 1.0
+        node_flops = float(arguments["node_flops"]) if "node_flops" in arguments else Job.node_flops
+        record = JobRecord(flops, parallel_percentage, node_flops, self.num_nodes_pref, self.num_nodes_min, self.num_nodes_max)
+        if "divide" in arguments:  # iterations of the application model, see jsonGenerator.py
+            record.iterations = max(1, int(arguments["divide"]))
+        if "runtime" in arguments:
+            record.runtime = float(arguments["runtime"])
+            record.work = record.runtime * record.get_rate(self.num_nodes_min)
+        else:
+            iterations = float(arguments["iterations"]) if "iterations" in arguments else 1
+            record.work = flops * iterations
+            record.runtime = record.work / record.get_rate(self.num_nodes_min)
+        if "resize_cost" in arguments:
+            record.resize_cost = float(arguments["resize_cost"])
+        if "dwell_time" in arguments:
+            record.dwell_time = float(arguments["dwell_time"])
+        return record
 
     def __inject_estimated_num_nodes_pref(self):
         if "num_nodes_pref" not in self.arguments:
             num_pref_nodes = (self.num_nodes_min + self.num_nodes_max) // 2
             self.arguments["num_nodes_pref"] = num_pref_nodes
-            Logger.log(f"Attribute num_nodes_pref missing for Job{self.identifier}")
+            Logger.log_debug_message(f"Attribute num_nodes_pref missing for Job{self.identifier}")
         self.num_nodes_pref = int(self.arguments["num_nodes_pref"])
 
     def __on_inject(self):
-        if self.type != JobType.RIGID:
-            self.__inject_estimated_num_nodes_pref()
-        else:
-            self.num_nodes_min = self.num_nodes_max = self.num_nodes_pref = self.num_nodes
-        assert self.num_nodes_min <= self.num_nodes_pref
-        assert self.num_nodes_max >= self.num_nodes_pref
+        if self.type is JobType.RIGID:
+            self.num_nodes_min = self.num_nodes_max = self.num_nodes
+
+        record = Job.records.get(self.identifier)
+        if record is None:
+            if self.type is not JobType.RIGID:
+                self.__inject_estimated_num_nodes_pref()
+            else:
+                self.num_nodes_pref = self.num_nodes
+            assert self.num_nodes_min <= self.num_nodes_pref
+            assert self.num_nodes_max >= self.num_nodes_pref
+            record = Job.records[self.identifier] = self.__create_record()
+        self.record = record
+        self.num_nodes_pref = record.num_nodes_pref
 
     def __str__(self):
         out = f"Job{self.identifier}({self.type.name}) is {self.state.name}"
@@ -47,11 +181,13 @@ class Job(ElastiSimJob):
     def __repr__(self):
         return f"J{self.identifier}"
 
+    # only objects that were not injected before are processed
     @staticmethod
     def inject(jobs):
         for job in jobs:
-            job.__class__ = Job
-            job.__on_inject()
+            if job.__class__ is not Job:
+                job.__class__ = Job
+                job.__on_inject()
 
 
 # extended node-class, improves debug printing
@@ -71,12 +207,15 @@ class Node(ElastiSimNode):
     @staticmethod
     def inject(nodes):
         for node in nodes:
-            node.__class__ = Node
-            node.__on_inject()
+            if node.__class__ is not Node:
+                node.__class__ = Node
+                node.__on_inject()
 
 
 # extends job/node classes provided by elastiSim
+@Profiler.profile("injectExtension")
 def injectExtension(jobs, nodes, system, wait_for_input=False):
+    Job.time = float(system["time"])
     Job.inject(jobs)
     Node.inject(nodes)
     Logger.inject(system, wait_for_input)
@@ -9,8 +9,16 @@
 # SPDX-License-Identifier: EPL-2.0
 # ---------------------------------------------------------------------
 from elastisim_python import JobState, JobType, NodeState
+import atexit
 import csv
+import functools
+import json
 import os.path
+import queue
+import struct
+import threading
+import time
+from contextlib import contextmanager
 from enum import Enum
 
 
@@ -25,11 +33,314 @@ class EventType(Enum):
     AGREEMENT_FULLFILLED = 6
 
 
+# Queues items and writes them with a background thread, subclasses write and flush the items in write_items.
+# Items are flushed once flush_size items are queued or flush_interval seconds passed since the last flush.
+class BufferedWriter:
+    __FLUSH = object()
+    __CLOSE = object()
+
+    def __init__(self, flush_size=1000, flush_interval=5.0):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.error = None
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.__run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    def write_items(self, items):
+        raise NotImplementedError
+
+    def close_files(self):
+        raise NotImplementedError
+
+    def __write(self, items):
+        try:
+            self.write_items(items)
+        except Exception as e:
+            self.error = e
+        items.clear()
+        return time.monotonic()
+
+    def __run(self):
+        items = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if item is BufferedWriter.__CLOSE:
+                self.__write(items)
+                return
+            elif type(item) is tuple and item[0] is BufferedWriter.__FLUSH:
+                last_flush = self.__write(items)
+                item[1].set()
+            elif item is not None:
+                items.append(item)
+
+            if len(items) >= self.flush_size or (
+                len(items) > 0 and time.monotonic() - last_flush >= self.flush_interval
+            ):
+                last_flush = self.__write(items)
+
+    def __raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def write(self, item):
+        self.queue.put(item)
+
+    # blocks until all items written so far are in the file
+    def flush(self):
+        if self.thread.is_alive():
+            flushed = threading.Event()
+            self.queue.put((BufferedWriter.__FLUSH, flushed))
+            flushed.wait()
+        self.__raise_error()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(BufferedWriter.__CLOSE)
+            self.thread.join()
+        self.close_files()
+        self.__raise_error()
+
+
+# Writes csv rows through one file handle, see BufferedWriter
+class BufferedCsvWriter(BufferedWriter):
+    def __init__(self, file, header, flush_size=1000, flush_interval=5.0):
+        write_header = not os.path.isfile(file)
+        self.file = open(file, "a")
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(header)
+        super().__init__(flush_size, flush_interval)
+
+    def write_items(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close_files(self):
+        self.file.close()
+
+
+# Writes events as fixed-width binary records, the node ids of all events are packed into a second int32 file.
+# record: time float64, event uint8, job int32, second job int32 (-1 if none), node offset int64, node amount int32
+# Events are packed and flushed by the background thread of BufferedWriter, the node ids are flushed first, so every
+# record in the file points to written node ids.
+# scripts/output_evaluation/binaryEventLog.py reads both files and converts them back to event.csv
+class BinaryEventWriter(BufferedWriter):
+    record = struct.Struct("<dBiiqi")
+
+    def __init__(self, file, node_file, flush_size=1000, flush_interval=5.0):
+        self.file = open(file, "ab")
+        self.node_file = open(node_file, "ab")
+        self.node_offset = self.node_file.tell() // 4
+        super().__init__(flush_size, flush_interval)
+
+    def write(self, time, event, job_id, other_job_id, node_ids):
+        super().write((time, event, job_id, other_job_id, node_ids))
+
+    def write_items(self, events):
+        records = bytearray()
+        all_node_ids = []
+        for time, event, job_id, other_job_id, node_ids in events:
+            records += BinaryEventWriter.record.pack(time, event, job_id, other_job_id, self.node_offset, len(node_ids))
+            all_node_ids.extend(node_ids)
+            self.node_offset += len(node_ids)
+        self.node_file.write(struct.pack(f"<{len(all_node_ids)}i", *all_node_ids))
+        self.node_file.flush()
+        self.file.write(records)
+        self.file.flush()
+
+    def close_files(self):
+        self.file.close()
+        self.node_file.close()
+
+
+# Measures the time spent in the phases of a scheduler, disabled by default
+# every invocation writes one row per phase into timings.csv next to event.csv, tagged with the invocation time and
+# the amount of pending jobs, running jobs and free nodes. Phases can be nested, e.g. "logging" is also part of the
+# phase that logs the event. scripts/output_evaluation/evaluateOutput.py summarizes the file.
+class Profiler:
+    enabled = False
+    file = "data/output/timings.csv"
+    header = ["Time", "Phase", "Seconds", "Pending Jobs", "Running Jobs", "Free Nodes"]
+    writer = None
+    phases = dict()  # phase -> seconds of the current invocation
+
+    def add(phase, seconds):
+        Profiler.phases[phase] = Profiler.phases.get(phase, 0.0) + seconds
+
+    # measures the enclosed statements as the given phase
+    @contextmanager
+    def phase(name):
+        if not Profiler.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Profiler.add(name, time.perf_counter() - start)
+
+    # decorator, measures every call of the function as the given phase
+    def profile(name):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not Profiler.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    Profiler.add(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    # decorator for schedule(jobs, nodes, system), measures the whole invocation as "schedule" and writes all phases
+    def profile_invocation(schedule):
+        @functools.wraps(schedule)
+        def wrapper(jobs, nodes, system):
+            if not Profiler.enabled:
+                return schedule(jobs, nodes, system)
+            tags = [
+                sum(1 for j in jobs if j.state is JobState.PENDING),
+                sum(1 for j in jobs if j.state is JobState.RUNNING),
+                sum(1 for n in nodes if n.state is NodeState.FREE),
+            ]
+            Profiler.phases = dict()
+            start = time.perf_counter()
+            try:
+                return schedule(jobs, nodes, system)
+            finally:
+                Profiler.add("schedule", time.perf_counter() - start)
+                Profiler.write(system["time"], tags)
+
+        return wrapper
+
+    def write(invocation_time, tags):
+        if Profiler.writer is None:
+            Profiler.writer = BufferedCsvWriter(Profiler.file, Profiler.header)
+        for phase, seconds in Profiler.phases.items():
+            Profiler.writer.write([invocation_time, phase, f"{seconds:.9f}"] + tags)
+
+    def close():
+        if Profiler.writer is not None:
+            writer, Profiler.writer = Profiler.writer, None
+            writer.close()
+
+
+# Records the input and the decisions of every scheduler invocation, disabled by default
+# every invocation is appended as one json line to invocations.jsonl next to event.csv:
+# s: system, j: jobs [id, type, state, num_nodes, min, max, submit time, start time, node ids] that changed since the
+# last invocation, a: [id, arguments] of new jobs, v: nodes [id, state, job ids] that changed, o/p: job/node id order
+# if it is not the last order with new ids appended, d: [id, node ids] of jobs whose nodes the scheduler changed,
+# e: error of the invocation. scripts/offline/replayInvocations.py feeds the invocations into any algorithm.
+class Recorder:
+    enabled = False
+    file = "data/output/invocations.jsonl"
+    handle = None
+    jobs = dict()  # job id -> last recorded values
+    nodes = dict()  # node id -> last recorded values
+    job_order = []
+    node_order = []
+
+    def __get_job_values(job):
+        return [
+            job.type.name, job.state.name, job.num_nodes, job.num_nodes_min, job.num_nodes_max,
+            getattr(job, "submit_time", None), job.start_time, [n.identifier for n in job.assigned_nodes],
+        ]
+
+    # appends the ids to the last order, returns the ids if the order changed otherwise
+    def __get_order(ids, last_ids):
+        return None if ids[: len(last_ids)] == last_ids else ids
+
+    def __get_input(jobs, nodes, system):
+        record = {"s": {k: v.name if isinstance(v, Enum) else v for k, v in system.items()}}
+        changed_jobs, new_jobs = [], []
+        for job in jobs:
+            values = Recorder.__get_job_values(job)
+            last_values = Recorder.jobs.get(job.identifier)
+            if last_values is None:
+                new_jobs.append([job.identifier, job.arguments])
+            if values != last_values:
+                changed_jobs.append([job.identifier] + values)
+                Recorder.jobs[job.identifier] = values
+
+        changed_nodes = []
+        for node in nodes:
+            values = [node.state.name, sorted(node.assigned_job_ids)]
+            if Recorder.nodes.get(node.identifier) != values:
+                changed_nodes.append([node.identifier] + values)
+                Recorder.nodes[node.identifier] = values
+
+        record.update(j=changed_jobs, a=new_jobs, v=changed_nodes)
+        job_order = Recorder.__get_order([j.identifier for j in jobs], Recorder.job_order)
+        node_order = Recorder.__get_order([n.identifier for n in nodes], Recorder.node_order)
+        if job_order is not None:
+            record["o"] = job_order
+        if node_order is not None:
+            record["p"] = node_order
+        Recorder.job_order = [j.identifier for j in jobs]
+        Recorder.node_order = [n.identifier for n in nodes]
+        return record
+
+    # decorator for schedule(jobs, nodes, system), records the input before the scheduler changes it
+    def record_invocation(schedule):
+        @functools.wraps(schedule)
+        def wrapper(jobs, nodes, system):
+            if not Recorder.enabled:
+                return schedule(jobs, nodes, system)
+            record = Recorder.__get_input(jobs, nodes, system)
+            assigned_nodes = {j.identifier: Recorder.jobs[j.identifier][-1] for j in jobs}
+            try:
+                return schedule(jobs, nodes, system)
+            except Exception as e:
+                record["e"] = repr(e)
+                raise
+            finally:
+                decisions = []
+                for job in jobs:
+                    node_ids = [n.identifier for n in job.assigned_nodes]
+                    if node_ids != assigned_nodes[job.identifier]:
+                        decisions.append([job.identifier, node_ids])
+                record["d"] = decisions
+                Recorder.write(record)
+
+        return wrapper
+
+    def write(record):
+        if Recorder.handle is None:
+            Recorder.handle = open(Recorder.file, "a")
+        Recorder.handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+        Recorder.handle.flush()
+
+    def close():
+        if Recorder.handle is not None:
+            handle, Recorder.handle = Recorder.handle, None
+            handle.close()
+
+
 # Logger class to log events, debug and print the system state
 class Logger:
     print_debug_messages = False
     print_events = False
     print_system_state_on_change = False
+    buffer_events = False  # write events through a BufferedCsvWriter instead of opening event.csv per event
+    event_file = "data/output/event.csv"
+    event_header = ["Time", "Event", "Jobs", "Nodes"]
+    event_writer = None
+    csv_events = True  # write event.csv
+    binary_events = False  # write events through a BinaryEventWriter into event.bin and event_nodes.bin
+    binary_event_file = "data/output/event.bin"
+    binary_event_node_file = "data/output/event_nodes.bin"
+    binary_event_writer = None
 
     def inject(system, wait_for_input=False):
         Logger.time = int(system["time"])
@@ -49,11 +360,18 @@ class Logger:
     def log_debug_message(message):
         Logger.__print(message, Logger.print_debug_messages)
 
-    def __write_next_row_in_event_csv(row, file="data/output/event.csv"):
+    def __write_next_row_in_event_csv(row, file=None):
+        file = file or Logger.event_file
+        if Logger.buffer_events:
+            if Logger.event_writer is None:
+                Logger.event_writer = BufferedCsvWriter(file, Logger.event_header)
+            Logger.event_writer.write(row)
+            return
+
         if not os.path.isfile(file):
             with open(file, "x") as f:
                 writer = csv.writer(f)
-                writer.writerow(["Time", "Event", "Jobs", "Nodes"])
+                writer.writerow(Logger.event_header)
                 f.close()
 
         with open(file, "a") as f:
@@ -61,12 +379,35 @@ class Logger:
             writer.writerow(row)
             f.close()
 
+    def __write_binary_event(event: EventType, job, nodes):
+        if Logger.binary_event_writer is None:
+            Logger.binary_event_writer = BinaryEventWriter(Logger.binary_event_file, Logger.binary_event_node_file)
+        time = float(Logger.time) if Logger.time is not None else float("nan")
+        job_id, other_job_id = (job[0].identifier, job[1].identifier) if type(job) in (tuple, list) else (job.identifier, -1)
+        node_ids = [n.identifier for n in nodes]
+        Logger.binary_event_writer.write(time, event.value, job_id, other_job_id, node_ids)
+
+    # writes all buffered events, called at exit and if the scheduler fails
+    def close():
+        if Logger.event_writer is not None:
+            writer, Logger.event_writer = Logger.event_writer, None
+            writer.close()
+        if Logger.binary_event_writer is not None:
+            writer, Logger.binary_event_writer = Logger.binary_event_writer, None
+            writer.close()
+        Profiler.close()
+        Recorder.close()
+
+    @Profiler.profile("logging")
     def log_event(event: EventType, job, nodes, *args):
         time = str(Logger.time) if Logger.time is not None else ""
         job_string = f"{job[0].__repr__()} -> {job[1].__repr__()}" if type(job) in (tuple, list) else job.__repr__()
 
         new_event_row = [time, event.name] + [job_string, f"{nodes}"] + list(args)
-        Logger.__write_next_row_in_event_csv(new_event_row)
+        if Logger.csv_events:
+            Logger.__write_next_row_in_event_csv(new_event_row)
+        if Logger.binary_events:
+            Logger.__write_binary_event(event, job, nodes)
         Logger.__print(new_event_row, Logger.print_events)
 
     def log_system(jobs, nodes, system, additional_information="", seperation_line="-" * 100):
@@ -98,3 +439,6 @@ class Logger:
             system_row = f"\nSystem State(t={round(Logger.time)}):"
             out = f"{system_row}{seperation_line[:-len(system_row)]}\n{out}\n"
             Logger.__print(out, Logger.print_system_state_on_change)
+
+
+atexit.register(Logger.close)
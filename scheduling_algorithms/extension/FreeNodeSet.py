@@ -0,0 +1,166 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+
+
+# Free node ids in a segment tree over the id range, nodes are allocated lowest id first.
+# Every tree node keeps the free amount and the free runs at its left and right border and the longest free run
+# below it, so free, remove and contains are O(log n), allocate(k) is O(k log n) and allocate_contiguous(k)
+# finds the first run of k free ids in O(log n). Changes of many nodes at once recompute the tree level by level.
+# Node objects are only looked up for the allocated ids, either in the nodes the set was built from or with the given
+# lookup function.
+class FreeNodeSet:
+    def __init__(self, nodes=(), lookup=None):
+        self.nodes = dict()  # node id -> Node, only used without lookup
+        self.keep_nodes = lookup is None
+        self.lookup = self.nodes.__getitem__ if lookup is None else lookup
+        self.removed = None  # ids of the removed nodes if set to a list, see StateIndex
+        self.capacity = 1
+        self.count = [0, 0]
+        self.prefix = [0, 0]  # free run at the left border
+        self.suffix = [0, 0]  # free run at the right border
+        self.longest = [0, 0]
+        self.free(nodes)
+
+    def __len__(self):
+        return self.count[1]
+
+    def __contains__(self, node):
+        node_id = getattr(node, "identifier", node)
+        return 0 <= node_id < self.capacity and self.count[self.capacity + node_id] == 1
+
+    def __iter__(self):
+        for node_id in self.__get_ids(len(self)):
+            yield self.lookup(node_id)
+
+    def __repr__(self):
+        return f"FreeNodeSet({self.__get_ids(len(self))})"
+
+    # sets the leaves of the node ids and recomputes their ancestors once each, level by level
+    # many changed leaves recompute the whole tree instead
+    def __set(self, node_ids, value):
+        capacity = self.capacity
+        count, prefix, suffix, longest = self.count, self.prefix, self.suffix, self.longest
+        parents = set()
+        for node_id in node_ids:
+            i = capacity + node_id
+            count[i] = prefix[i] = suffix[i] = longest[i] = value
+            parents.add(i >> 1)
+        if len(parents) > capacity // 16:
+            self.__rebuild()
+            return
+        half = 1
+        while len(parents) > 0 and 0 not in parents:
+            for i in parents:
+                left, right = 2 * i, 2 * i + 1
+                count[i] = count[left] + count[right]
+                prefix[i] = prefix[left] if prefix[left] < half else half + prefix[right]
+                suffix[i] = suffix[right] if suffix[right] < half else half + suffix[left]
+                longest[i] = max(longest[left], longest[right], suffix[left] + prefix[right])
+            parents = {i >> 1 for i in parents if i > 1}
+            half *= 2
+
+    # recomputes all tree nodes from the leaves, one level at a time
+    def __rebuild(self):
+        count, prefix, suffix, longest = self.count, self.prefix, self.suffix, self.longest
+        start, half = self.capacity // 2, 1
+        while start > 0:
+            left, right, end = slice(2 * start, 4 * start, 2), slice(2 * start + 1, 4 * start, 2), 2 * start
+            prefix_right, suffix_left = prefix[right], suffix[left]
+            count[start:end] = [a + b for a, b in zip(count[left], count[right])]
+            prefix[start:end] = [a if a < half else half + b for a, b in zip(prefix[left], prefix_right)]
+            suffix[start:end] = [b if b < half else half + a for a, b in zip(suffix_left, suffix[right])]
+            longest[start:end] = [
+                max(a, b, c + d) for a, b, c, d in zip(longest[left], longest[right], suffix_left, prefix_right)
+            ]
+            start, half = start // 2, half * 2
+
+    # doubles the id range until node_id fits, the tree is rebuilt once
+    def __grow(self, node_id):
+        node_ids = self.__get_ids(len(self))
+        capacity = self.capacity
+        while capacity <= node_id:
+            capacity *= 2
+        self.capacity = capacity
+        self.count = [0] * (2 * capacity)
+        self.prefix = [0] * (2 * capacity)
+        self.suffix = [0] * (2 * capacity)
+        self.longest = [0] * (2 * capacity)
+        self.__set(node_ids, 1)
+
+    # returns the lowest amount free node ids in order, only subtrees with free nodes are visited
+    # and completely free subtrees are taken as a whole
+    def __get_ids(self, amount):
+        count = self.count
+        node_ids = []
+        stack = [(1, 0, self.capacity)] if count[1] > 0 else []
+        while len(stack) > 0 and len(node_ids) < amount:
+            i, start, width = stack.pop()
+            if count[i] == width:
+                node_ids.extend(range(start, start + min(width, amount - len(node_ids))))
+                continue
+            half = width // 2
+            if count[2 * i + 1] > 0:
+                stack.append((2 * i + 1, start + half, half))
+            if count[2 * i] > 0:
+                stack.append((2 * i, start, half))
+        return node_ids
+
+    def __remove_ids(self, node_ids):
+        self.__set(node_ids, 0)
+        if self.removed is not None:
+            self.removed.extend(node_ids)
+
+    # adds nodes or node ids to the set
+    def free(self, nodes):
+        node_ids = []
+        for node in nodes:
+            node_id = getattr(node, "identifier", node)
+            if self.keep_nodes and node_id is not node:
+                self.nodes[node_id] = node
+            node_ids.append(node_id)
+        if len(node_ids) > 0 and max(node_ids) >= self.capacity:
+            self.__grow(max(node_ids))
+        self.__set(node_ids, 1)
+
+    # removes the given nodes or node ids from the set, nodes that are not free are ignored
+    def remove(self, nodes):
+        node_ids = [i for i in (getattr(node, "identifier", node) for node in nodes) if i in self]
+        self.__remove_ids(node_ids)
+
+    # removes and returns the amount lowest node ids, fewer if the set is smaller
+    def allocate(self, amount):
+        node_ids = self.__get_ids(amount)
+        self.__remove_ids(node_ids)
+        return [self.lookup(i) for i in node_ids]
+
+    # removes and returns amount nodes with consecutive ids from the first free run that is large enough,
+    # None if no such run exists
+    def allocate_contiguous(self, amount):
+        if amount <= 0:
+            return []
+        if self.longest[1] < amount:
+            return None
+        prefix, suffix, longest = self.prefix, self.suffix, self.longest
+        i, start, half = 1, 0, self.capacity // 2
+        while half > 0:
+            left, right = 2 * i, 2 * i + 1
+            if longest[left] >= amount:
+                i = left
+            elif suffix[left] + prefix[right] >= amount:
+                start += half - suffix[left]
+                break
+            else:
+                i = right
+                start += half
+            half //= 2
+        node_ids = list(range(start, start + amount))
+        self.__remove_ids(node_ids)
+        return [self.lookup(i) for i in node_ids]
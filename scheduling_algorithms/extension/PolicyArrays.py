@@ -0,0 +1,126 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the schedulers fall back to their per-job loops
+    np = None
+
+from extension.ElastiSimExtension import *
+
+
+# Running malleable jobs packed into numpy arrays once per invocation: assigned node amount, num_nodes_min,
+# num_nodes_pref, num_nodes_max, parallel percentage and the amount of assigned nodes that have an agreement (locked).
+# Node targets are passed as arrays, e.g. arrays.num_nodes_pref to keep num_nodes_pref nodes of every job.
+# Priorities and shrink and expand candidates of all jobs are computed as array operations, node lists are only built
+# for the selected jobs. Every assign or remove on a packed job has to be reported with update(job).
+# Only used with PolicyArrays.enabled = True and numpy installed, otherwise create() returns None.
+class PolicyArrays:
+    enabled = False
+
+    def __init__(self, rm_jobs: list[Job], agreements):
+        self.jobs = list(rm_jobs)
+        self.agreements = agreements
+        self.positions = {j: i for i, j in enumerate(self.jobs)}
+        records = [j.record for j in self.jobs]
+        self.assigned = np.array([len(j.assigned_nodes) for j in self.jobs], dtype=np.int64)
+        self.num_nodes_min = np.array([r.num_nodes_min for r in records], dtype=np.int64)
+        self.num_nodes_pref = np.array([r.num_nodes_pref for r in records], dtype=np.int64)
+        self.num_nodes_max = np.array([r.num_nodes_max for r in records], dtype=np.int64)
+        self.parallel_percentage = np.array([r.parallel_percentage for r in records], dtype=np.float64)
+        self.locked = np.array(
+            [sum(1 for n in j.assigned_nodes if agreements.has_agreement(n)) for j in self.jobs], dtype=np.int64
+        )
+
+    @staticmethod
+    def create(rm_jobs: list[Job], agreements):
+        if not PolicyArrays.enabled or np is None:
+            return None
+        return PolicyArrays(rm_jobs, agreements)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    # reads the assigned node amount of the job again after it was expanded or shrunk
+    def update(self, job: Job):
+        self.assigned[self.positions[job]] = len(job.assigned_nodes)
+
+    # amount of nodes without agreement behind the first target[i] assigned nodes of each job
+    def get_shrinkable_amounts(self, target):
+        amounts = np.maximum(self.assigned - target, 0)
+        for i in np.flatnonzero(self.locked):
+            amounts[i] = len(self.get_shrinkable_nodes(i, int(target[i])))
+        return amounts
+
+    # nodes without agreement behind the first target assigned nodes of the i-th job
+    def get_shrinkable_nodes(self, i, target, amount=None):
+        job = self.jobs[i]
+        if self.locked[i] == 0:
+            return job.assigned_nodes[target:] if amount is None else job.assigned_nodes[target:target + amount]
+        nodes = [n for n in job.assigned_nodes[target:] if not self.agreements.has_agreement(n)]
+        return nodes if amount is None else nodes[:amount]
+
+    # assigned nodes of the job without agreement
+    def get_unlocked_nodes(self, job: Job):
+        i = self.positions[job]
+        return self.jobs[i].assigned_nodes if self.locked[i] == 0 else self.get_shrinkable_nodes(i, 0)
+
+    # jobs with nodes without agreement behind their first target[i] assigned nodes and the amount of these nodes,
+    # in list order
+    def get_shrinkable_jobs(self, target):
+        amounts = self.get_shrinkable_amounts(target)
+        return {self.jobs[i]: int(amounts[i]) for i in np.flatnonzero(amounts)}
+
+    def __get_positions(self, jobs: list[Job]):
+        return np.array([self.positions[j] for j in jobs], dtype=np.int64)
+
+    # share of the node range between num_nodes_min and num_nodes_max the jobs use,
+    # the same values as get_average_job_priority of the average schedulers
+    def get_node_usages(self, jobs: list[Job]):
+        positions = self.__get_positions(jobs)
+        num_nodes_min = self.num_nodes_min[positions]
+        return ((self.assigned[positions] - num_nodes_min) / (self.num_nodes_max[positions] - num_nodes_min)).tolist()
+
+    # speedup the jobs gain if they run on assigned + offset + 1 instead of assigned + offset nodes,
+    # the same values as SpeedupPolicy.get_marginal_speedup
+    def get_marginal_speedups(self, jobs: list[Job], offset=0):
+        positions = self.__get_positions(jobs)
+        parallel_percentage = self.parallel_percentage[positions]
+        num_nodes = self.assigned[positions] + offset
+        speedup = 1 / ((1 - parallel_percentage) + parallel_percentage / num_nodes)
+        next_speedup = 1 / ((1 - parallel_percentage) + parallel_percentage / (num_nodes + 1))
+        return (next_speedup - speedup).tolist()
+
+    # jobs that can give up nodes and keep more than target[i] nodes without agreement, in list order
+    def get_shrink_candidates(self, target):
+        return [self.jobs[i] for i in np.flatnonzero(self.assigned - self.locked > target)]
+
+    # takes required nodes from the jobs in descending priority, equal priorities in list order
+    # each job keeps its first target[i] assigned nodes, returns None if the jobs cannot give up required nodes
+    def select_shrink_jobs(self, required_nodes: int, target, priority):
+        order = np.argsort(-priority, kind="stable")
+        amounts = self.get_shrinkable_amounts(target)[order]
+        if amounts.sum() < required_nodes:
+            return None
+        taken = np.clip(required_nodes - (np.cumsum(amounts) - amounts), 0, amounts)
+        return {
+            self.jobs[i]: self.get_shrinkable_nodes(i, int(target[i]), int(amount))
+            for i, amount in zip(order[taken > 0], taken[taken > 0])
+        }
+
+    # jobs with less than target[i] assigned nodes, in list order
+    def get_expandable_jobs(self, target):
+        return [self.jobs[i] for i in np.flatnonzero(self.assigned < target)]
+
+    # jobs below their target in ascending priority, equal priorities in list order, with their missing node amount
+    def get_expand_candidates(self, target, priority):
+        order = np.argsort(priority, kind="stable")
+        missing = (target - self.assigned)[order]
+        return [(self.jobs[i], int(amount)) for i, amount in zip(order[missing > 0], missing[missing > 0])]
@@ -0,0 +1,90 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+from extension.ElastiSimExtension import *
+
+
+# Cost model for expanding and shrinking malleable jobs, shared by all malleable schedulers
+# a job is only resized if its last resize is at least dwell_time ago,
+# an expand is only done if the work gained within the dwell window exceeds the work lost by resize_cost,
+# a shrink is only done if the job receiving the nodes gains more work within its dwell window than the shrunk jobs
+# lose.
+# Jobs with the arguments resize_cost or dwell_time use their own values instead of the defaults.
+# With the default values every resize is allowed.
+class ReconfigurationCost:
+    resize_cost = 0.0  # seconds a job makes no progress while its data is redistributed
+    dwell_time = 0.0  # minimal seconds between two resizes of a job
+
+    @staticmethod
+    def get_resize_cost(job: Job):
+        resize_cost = job.record.resize_cost
+        return ReconfigurationCost.resize_cost if resize_cost is None else resize_cost
+
+    @staticmethod
+    def get_dwell_time(job: Job):
+        dwell_time = job.record.dwell_time
+        return ReconfigurationCost.dwell_time if dwell_time is None else dwell_time
+
+    # the dwell time of the job, capped at its remaining runtime
+    @staticmethod
+    def get_window(job: Job, remaining_runtime: float):
+        return min(ReconfigurationCost.get_dwell_time(job) or remaining_runtime, remaining_runtime)
+
+    @staticmethod
+    def may_resize(job: Job):
+        resize_time = job.record.resize_time
+        return resize_time is None or Job.time - resize_time >= ReconfigurationCost.get_dwell_time(job)
+
+    # returns the jobs that may be expanded or shrunk now
+    @staticmethod
+    def get_resizable_jobs(jobs: list[Job]):
+        return [j for j in jobs if ReconfigurationCost.may_resize(j)]
+
+    # checks if expanding the job by node_amount pays off within the dwell window (or its remaining runtime)
+    @staticmethod
+    def is_worth_expand(job: Job, node_amount: int):
+        resize_cost = ReconfigurationCost.get_resize_cost(job)
+        if resize_cost == 0:
+            return True
+        record = job.record
+        num_nodes = len(job.assigned_nodes)
+        remaining_runtime = (
+            job.get_remaining_runtime() * record.get_rate(num_nodes) / record.get_rate(num_nodes + node_amount)
+        )
+        window = ReconfigurationCost.get_window(job, remaining_runtime)
+        gained_work = (record.get_rate(num_nodes + node_amount) - record.get_rate(num_nodes)) * window
+        lost_work = resize_cost * record.get_rate(num_nodes)
+        return gained_work > lost_work
+
+    # checks if the nodes shrunk from the jobs in shrinkables (job -> nodes) pay off for the job receiving them
+    # a pending job gains its rate per node for every shrunk node, a running job the rate of its expand
+    # the shrunk jobs lose the rate of the nodes within the window and their resize_cost
+    @staticmethod
+    def is_worth_shrink(job: Job, shrinkables: dict):
+        shrinkables = {j: nodes for j, nodes in shrinkables.items() if len(nodes) > 0}
+        if all(ReconfigurationCost.get_resize_cost(j) == 0 for j in shrinkables):
+            return True
+        record = job.record
+        node_amount = sum(len(nodes) for nodes in shrinkables.values())
+        num_nodes = len(job.assigned_nodes)
+        if num_nodes == 0:
+            start_nodes = max(record.num_nodes_min, node_amount)
+            gained_rate = record.get_rate(start_nodes) * node_amount / start_nodes
+        else:
+            gained_rate = record.get_rate(num_nodes + node_amount) - record.get_rate(num_nodes)
+        window = ReconfigurationCost.get_window(job, job.get_remaining_runtime())
+        lost_work = 0.0
+        for s_job, nodes in shrinkables.items():
+            s_record = s_job.record
+            s_num_nodes = len(s_job.assigned_nodes)
+            lost_rate = s_record.get_rate(s_num_nodes) - s_record.get_rate(s_num_nodes - len(nodes))
+            lost_work += lost_rate * min(window, s_job.get_remaining_runtime())
+            lost_work += ReconfigurationCost.get_resize_cost(s_job) * s_record.get_rate(s_num_nodes)
+        return gained_rate * window > lost_work
@@ -0,0 +1,92 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+from extension.ElastiSimExtension import *
+from extension.WaterFilling import WaterFilling
+from extension.ReconfigurationCost import ReconfigurationCost
+from extension.FreeNodeSet import FreeNodeSet
+
+
+# speedup the job gains if it runs on num_nodes + 1 instead of num_nodes nodes
+def get_marginal_speedup(job: Job, num_nodes: int):
+    return job.get_speedup(num_nodes + 1) - job.get_speedup(num_nodes)
+
+
+# expands malleable jobs with the free nodes, every node is given to the job with the highest marginal speedup
+# the amdahl speedup is concave, so this maximizes the summed speedup of all malleable jobs
+# each job is expanded to at most node_target(job) nodes, with PolicyArrays target holds node_target of all packed jobs
+# and the marginal speedups before the first node are computed for all jobs at once
+@Profiler.profile("expand_by_marginal_speedup")
+def expand_jobs_by_marginal_speedup(rm_jobs: list[Job], free_nodes: FreeNodeSet, node_target, arrays=None, target=None):
+    if arrays is not None:
+        candidates = arrays.get_expandable_jobs(target)
+        keys = [-s for s in arrays.get_marginal_speedups(candidates)]
+    else:
+        candidates = [j for j in rm_jobs if len(j.assigned_nodes) < node_target(j)]
+        keys = None
+    filling = WaterFilling(
+        candidates, lambda j, amount: -get_marginal_speedup(j, len(j.assigned_nodes) + amount), keys
+    )
+    for _ in range(len(free_nodes)):
+        job = filling.top()
+        if job is None:
+            break
+        filling.take(len(job.assigned_nodes) + filling.amounts[job] + 1 < node_target(job))
+
+    for job, node_amount in filling.amounts.items():
+        if node_amount == 0 or not ReconfigurationCost.is_worth_expand(job, node_amount):
+            continue
+        nodes_to_assign = free_nodes.allocate(node_amount)
+        job.assign(nodes_to_assign)
+        Logger.log_event(EventType.EXPAND, job, nodes_to_assign)
+        if arrays is not None:
+            arrays.update(job)
+
+
+# speedup the job loses if it runs on num_nodes - 1 instead of num_nodes nodes
+def get_marginal_speedup_loss(job: Job, num_nodes: int):
+    return get_marginal_speedup(job, num_nodes - 1)
+
+
+# calculate a list of nodes with a size of required_nodes that can by reallocated from running malleable jobs
+# every node is taken from the job that loses the least speedup, each job keeps at least node_target(job) nodes
+# with PolicyArrays target holds node_target of all packed jobs and node lists are only built for the selected jobs
+# returns None if not enough nodes can be reallocated
+def select_shrink_by_marginal_speedup(
+    rm_jobs: list[Job], required_nodes: int, node_target, agreements, arrays=None, target=None
+):
+    if arrays is not None:
+        shrinkable_amounts = arrays.get_shrinkable_jobs(target)
+        keys = arrays.get_marginal_speedups(list(shrinkable_amounts), -1)
+    else:
+        shrinkable_nodes = dict()
+        for job in rm_jobs:
+            nodes = [n for n in job.assigned_nodes[node_target(job):] if not agreements.has_agreement(n)]
+            if len(nodes) > 0:
+                shrinkable_nodes[job] = nodes
+        shrinkable_amounts = {j: len(nodes) for j, nodes in shrinkable_nodes.items()}
+        keys = None
+
+    filling = WaterFilling(
+        list(shrinkable_amounts),
+        lambda j, amount: get_marginal_speedup_loss(j, len(j.assigned_nodes) - amount),
+        keys,
+    )
+    for _ in range(required_nodes):
+        job = filling.top()
+        if job is None:
+            return None
+        filling.take(filling.amounts[job] + 1 < shrinkable_amounts[job])
+    if arrays is not None:
+        return {
+            j: arrays.get_shrinkable_nodes(arrays.positions[j], int(target[arrays.positions[j]]), amount)
+            for j, amount in filling.amounts.items() if amount > 0
+        }
+    return {j: shrinkable_nodes[j][:amount] for j, amount in filling.amounts.items() if amount > 0}
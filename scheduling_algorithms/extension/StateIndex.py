@@ -0,0 +1,265 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+from elastisim_python import JobState, JobType, NodeState
+from extension.ElastiSimLogger import Profiler
+from extension.ElastiSimExtension import Job
+from extension.FreeNodeSet import FreeNodeSet
+from extension.ReconfigurationCost import ReconfigurationCost
+
+
+# job states a job will never leave again
+FINAL_JOB_STATES = (JobState.COMPLETED, JobState.KILLED)
+
+
+# Keeps pending jobs, running (malleable) jobs and free nodes between scheduler invocations.
+# ElastiSim passes every job ever submitted, completed jobs included, with new jobs appended to the end.
+# Only jobs that were active during the last invocation and newly submitted jobs are checked again,
+# so the cost of an invocation does not grow with the amount of already finished jobs.
+# Nodes only change their state if a job ends or a decision takes effect, so only the nodes of ended jobs, the nodes
+# of decisions that did not take effect yet and the nodes taken from the free node set are checked again.
+# The free node set is kept across invocations and only changed by the checked nodes and the excluded nodes.
+# is_unchanged() detects invocations that can not lead to a decision, see below.
+class StateIndex:
+    skip_unchanged = True  # set to False to run every invocation completely
+
+    def __init__(self):
+        self.__reset()
+
+    def __reset(self):
+        self.jobs_seen = 0
+        self.job_positions = dict()  # job id -> index in the jobs list
+        self.active = dict()  # job id -> job, for all jobs that are not finished
+        self.pending = dict()
+        self.running = dict()
+        self.running_malleable = dict()
+        self.job_states = dict()  # job id -> state of the active job at the last update
+        self.version = 0  # incremented on every change of a job state, an assigned node amount or the free nodes
+        self.nodes = []
+        self.node_positions = None  # node id -> index in the nodes list, None if every node is at the index of its id
+        self.free_ids = set()
+        self.free_set = None  # FreeNodeSet kept across invocations, see get_free_node_set
+        self.excluded = set()  # ids of the free nodes kept out of free_set, see get_free_node_set
+        self.set_freed = set()  # ids of the freed and taken nodes not yet applied to free_set, see get_free_node_set
+        self.set_taken = set()
+        self.held = dict()  # job id -> ids of all nodes assigned to the active job, checked again once it ends
+        self.assigned_amounts = dict()  # job id -> amount of assigned nodes when held was last refreshed
+        self.watched = dict()  # node id -> expected free state, nodes of decisions that did not take effect yet
+        self.changed_nodes = None  # ids of the nodes that were freed or taken, None if unknown, see take_changed_nodes
+        self.fingerprints = dict()  # invocation type -> (fingerprint, expiry time) of the last complete invocation
+        self.invocation_type = None
+
+    # checks that the jobs list still has the layout of the last invocation, jobs are only appended
+    def __is_consistent(self, jobs, nodes):
+        if len(jobs) < self.jobs_seen or len(nodes) != len(self.nodes):
+            return False
+        positions = self.job_positions
+        return all(jobs[positions[job_id]].identifier == job_id for job_id in self.active)
+
+    def __add_job(self, job, released_nodes):
+        job_id = job.identifier
+        if job.state in FINAL_JOB_STATES:
+            released_nodes.extend(self.held.pop(job_id, ()))
+            self.assigned_amounts.pop(job_id, None)
+            if self.job_states.pop(job_id, None) is not None:
+                self.version += 1
+            return
+        if self.job_states.get(job_id) is not job.state:
+            self.job_states[job_id] = job.state
+            self.version += 1
+        self.active[job_id] = job
+        if job.state is JobState.PENDING:
+            self.pending[job_id] = job
+        elif job.state is JobState.RUNNING:
+            self.running[job_id] = job
+            if job.type is JobType.MALLEABLE:
+                self.running_malleable[job_id] = job
+        if len(job.assigned_nodes) != self.assigned_amounts.get(job_id, 0):
+            self.version += 1
+            self.held.setdefault(job_id, set()).update(n.identifier for n in job.assigned_nodes)
+            self.assigned_amounts[job_id] = len(job.assigned_nodes)
+
+    # maps the node ids to their index in the nodes list
+    def __index_positions(self, nodes):
+        if all(n.identifier == i for i, n in enumerate(nodes)):
+            self.node_positions = None
+        else:
+            self.node_positions = {n.identifier: i for i, n in enumerate(nodes)}
+
+    # builds the free nodes from all nodes, on the first invocation and if the nodes list changed
+    # nodes that are not free and not held by a job are watched until they are free
+    def __index_nodes(self, nodes):
+        self.__index_positions(nodes)
+        self.free_ids = {n.identifier for n in nodes if n.state is NodeState.FREE}
+        self.free_set = FreeNodeSet(sorted(self.free_ids), self.get_node)
+        self.version += 1
+        self.free_set.removed = []
+        self.excluded, self.set_freed, self.set_taken = set(), set(), set()
+        node_ids = set(range(len(nodes))) if self.node_positions is None else set(self.node_positions)
+        held_ids = set().union(*self.held.values())
+        self.watched = dict.fromkeys(node_ids.difference(self.free_ids, held_ids), True)
+        self.changed_nodes = None
+        Job.node_changes.clear()
+
+    # checks the nodes that may have changed their state since the last invocation, see above
+    # every node that is not free is held by an active job or watched, so it is checked again once it may be freed
+    def __update_nodes(self, released_nodes):
+        candidates = set(released_nodes).union(self.watched, self.free_set.removed)
+        freed_nodes = {node_id for node_id in candidates if self.get_node(node_id).state is NodeState.FREE}
+        taken_nodes = candidates.difference(freed_nodes)
+        changed_nodes = freed_nodes.difference(self.free_ids).union(taken_nodes.intersection(self.free_ids))
+        self.free_ids.update(freed_nodes)
+        self.free_ids.difference_update(taken_nodes)
+        if len(changed_nodes) > 0:
+            self.version += 1
+        if self.changed_nodes is not None:
+            self.changed_nodes.update(changed_nodes)
+
+        # watched nodes are checked until they reach their expected state, nodes of ended jobs until they are free
+        watched = self.watched
+        for node_id in [nid for nid, is_free in watched.items() if (nid in freed_nodes) is is_free]:
+            del watched[node_id]
+        for node_id in taken_nodes.intersection(released_nodes):
+            watched.setdefault(node_id, True)
+
+        self.set_freed.difference_update(taken_nodes)
+        self.set_freed.update(freed_nodes)
+        self.set_taken.difference_update(freed_nodes)
+        self.set_taken.update(taken_nodes)
+        self.free_set.removed = []
+
+    # updates the index with the jobs and nodes of the current invocation
+    @Profiler.profile("state")
+    def update(self, jobs: list, nodes: list):
+        if not self.__is_consistent(jobs, nodes):
+            self.__reset()
+        self.nodes = nodes
+
+        # nodes of the decisions since the last invocation, assigned nodes are held by their job
+        for job_id, node_ids, removed in Job.node_changes:
+            for node_id in node_ids:
+                self.watched[node_id] = removed
+            if not removed:
+                self.held.setdefault(job_id, set()).update(node_ids)
+        Job.node_changes.clear()
+
+        # refresh all jobs that were active during the last invocation, pending jobs keep their queue order
+        active_ids = list(self.active)
+        released_nodes = []
+        self.active, self.pending, self.running, self.running_malleable = dict(), dict(), dict(), dict()
+        for job_id in active_ids:
+            self.__add_job(jobs[self.job_positions[job_id]], released_nodes)
+
+        # add newly submitted jobs
+        for position in range(self.jobs_seen, len(jobs)):
+            job = jobs[position]
+            self.job_positions[job.identifier] = position
+            self.__add_job(job, released_nodes)
+        self.jobs_seen = len(jobs)
+
+        if self.free_set is None:
+            self.__index_nodes(nodes)
+        else:
+            self.__update_nodes(released_nodes)
+
+    # earliest time a decision may change without a change of the state: a running job reaches its estimated end
+    # (the EASY shadow time and the reservations move) or a malleable job passes the dwell time of its last resize
+    def __get_expiry(self, time: float):
+        expiry = float("inf")
+        for job in self.running.values():
+            expiry = min(expiry, time + job.get_remaining_runtime())
+            resize_time = job.record.resize_time
+            dwell_time = ReconfigurationCost.get_dwell_time(job)
+            if dwell_time > 0 and resize_time is not None:
+                if resize_time + dwell_time > time:
+                    expiry = min(expiry, resize_time + dwell_time)
+        return expiry
+
+    # checks if the invocation can be skipped, the algorithm is deterministic, so it is skipped if no job state,
+    # assigned node amount, free node or agreement changed and no decision was made since an earlier invocation
+    # of the same type and its expiry time is not reached
+    # the fingerprint only consists of counters, so the check does not depend on the amount of jobs and nodes
+    def is_unchanged(self, system: dict, agreements=None):
+        if not StateIndex.skip_unchanged:
+            return False
+        time = float(system["time"])
+        invocation_type = system.get("invocation_type")
+        fingerprint = (
+            self.version,
+            agreements.get_fingerprint() if agreements is not None else None,
+            Job.decisions,
+        )
+        last = self.fingerprints.get(invocation_type)
+        if last is not None and last[0] == fingerprint and time < last[1]:
+            return True
+        self.fingerprints[invocation_type] = (fingerprint, self.__get_expiry(time))
+        self.invocation_type = invocation_type
+        return False
+
+    # lowers the expiry time of the current invocation, used by algorithms with time dependent rules of their own
+    def set_expiry(self, time: float):
+        if self.invocation_type in self.fingerprints:
+            fingerprint, expiry = self.fingerprints[self.invocation_type]
+            self.fingerprints[self.invocation_type] = (fingerprint, min(expiry, time))
+
+    # returns the pending jobs in order of the jobs list
+    def get_pending_jobs(self):
+        return list(self.pending.values())
+
+    # returns the running jobs in order of the jobs list
+    def get_running_jobs(self):
+        return sorted(self.running.values(), key=lambda j: self.job_positions[j.identifier])
+
+    # returns the running malleable jobs in order of the jobs list
+    def get_running_malleable_jobs(self):
+        return sorted(self.running_malleable.values(), key=lambda j: self.job_positions[j.identifier])
+
+    # returns the pending jobs of the given job ids in order of the jobs list
+    def select_pending_jobs(self, job_ids):
+        jobs = [self.pending[job_id] for job_id in job_ids if job_id in self.pending]
+        return sorted(jobs, key=lambda j: self.job_positions[j.identifier])
+
+    # returns the node with the given id of the current invocation
+    def get_node(self, node_id):
+        nodes, positions = self.nodes, self.node_positions
+        position = node_id if positions is None else positions.get(node_id, -1)
+        if 0 <= position < len(nodes) and nodes[position].identifier == node_id:
+            return nodes[position]
+        self.__index_positions(nodes)  # the nodes list changed its order
+        return nodes[node_id if self.node_positions is None else self.node_positions[node_id]]
+
+    # checks if the node was free at the start of the invocation
+    def is_free(self, node_id):
+        return node_id in self.free_ids
+
+    # returns the free nodes in order of the node ids
+    def get_free_nodes(self):
+        return [self.get_node(node_id) for node_id in sorted(self.free_ids)]
+
+    # returns the free nodes without the given node ids as FreeNodeSet, e.g. without the nodes of agreements
+    # the set is kept across invocations, nodes taken from it are checked again by the next update and only the
+    # changes since the last call are applied, together with the difference to the excluded nodes of the last call
+    def get_free_node_set(self, excluded_node_ids=()):
+        excluded = set(excluded_node_ids)
+        free_set = self.free_set
+        freed_nodes = self.set_freed.union(self.excluded.difference(excluded))
+        freed_nodes.intersection_update(self.free_ids)
+        freed_nodes.difference_update(excluded)
+        free_set.free([node_id for node_id in freed_nodes if node_id not in free_set])
+        free_set.remove(self.set_taken.union(excluded.difference(self.excluded)))
+        self.excluded, self.set_freed, self.set_taken = excluded, set(), set()
+        return free_set
+
+    # returns the ids of the nodes that were freed or taken since the last call, None if they are unknown,
+    # e.g. on the first invocation, then all nodes have to be checked
+    def take_changed_nodes(self):
+        changed_nodes = self.changed_nodes
+        self.changed_nodes = set()
+        return changed_nodes
@@ -0,0 +1,42 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import heapq
+
+
+# Hands out nodes one at a time to the job with the smallest key.
+# key(job, amount) is the priority of a job after it got amount nodes, jobs with equal keys are served in list order.
+# Jobs are kept in a heap, taking a node updates only the served job in O(log R).
+# keys are the keys of the jobs before they got a node if they are already known, e.g. from PolicyArrays.
+class WaterFilling:
+    def __init__(self, jobs, key, keys=None):
+        self.key = key
+        self.amounts = {j: 0 for j in jobs}
+        if keys is None:
+            keys = [key(j, 0) for j in jobs]
+        self.heap = [(k, i, j) for i, (k, j) in enumerate(zip(keys, jobs))]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    # job that gets the next node, None if no job is left
+    def top(self):
+        return self.heap[0][2] if self.heap else None
+
+    # gives the next node to the top job, the job stays in the heap if keep is set
+    def take(self, keep=True):
+        _, i, job = self.heap[0]
+        self.amounts[job] += 1
+        if keep:
+            heapq.heapreplace(self.heap, (self.key(job, self.amounts[job]), i, job))
+        else:
+            heapq.heappop(self.heap)
+        return job
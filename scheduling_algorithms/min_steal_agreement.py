@@ -12,49 +12,52 @@
 # 1. schedules job FCFS with backfilling, tries to assign min_nodes first.
 # 2. if jobs are still pending, shrink malleable jobs to start more pending jobs (FCFS)
 #    agreement jobs can use free nodes and steal nodes from other agreements
+#    with global_steal, the free agreement nodes go to the waiting jobs so that the most jobs start
 # 3. if nodes are unused, expand malleable jobs (fewest nodes above min-nodes first)
 from elastisim_python import JobState, JobType, NodeState, pass_algorithm
 from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode
 from extension.ElastiSimExtension import *
-from extension.AgreementHandler import AgreementHandler, StealAgreementHandler
-
-
-agreements = StealAgreementHandler()
+from extension.AgreementHandler import AgreementHandler, StealAgreementHandler, GlobalStealAgreementHandler
+from extension.StateIndex import StateIndex
+from extension.FreeNodeSet import FreeNodeSet
+from extension.PolicyArrays import PolicyArrays
+from extension.ReconfigurationCost import ReconfigurationCost
+from extension.EasyBackfill import EasyBackfill
+from extension.SpeedupPolicy import expand_jobs_by_marginal_speedup, select_shrink_by_marginal_speedup
+
+
+state = StateIndex()
+lending = False  # run pending jobs on idle agreement nodes if they end before the agreement is due
+cancellation = False  # start waiting jobs on free nodes without agreement if possible and give up their agreement
+global_steal = False  # match the free agreement nodes to all waiting jobs at once, see GlobalStealAgreementHandler
+agreements = (GlobalStealAgreementHandler if global_steal else StealAgreementHandler)(
+    lending=lending, cancellation=cancellation, state=state
+)
+shrink_by_marginal_speedup = False  # take shrunk nodes from the jobs that lose the least speedup
+expand_by_marginal_speedup = False  # give free nodes to the jobs that gain the most speedup
 
 
 # priority to expand job
 def get_min_job_priority(job):
-    return len(job.assigned_nodes) - job.num_nodes_min
+    return len(job.assigned_nodes) - job.record.num_nodes_min
 
 
-# initial allocation is based on FCFS with backfilling
+# initial allocation is based on FCFS with EASY backfilling
+@Profiler.profile("initial_allocation")
 def initial_allocation(p_jobs, r_jobs, f_nodes, system, easy=True):
-    # checks if starting this job delays queue head.
-    def delays_head(job, req_nodes, head, running_jobs, free_nodes, system):
-        if job == head:
-            return False
-        time = float(system["time"])
-        def remaining_runtime(j): return j.start_time + j.get_estimated_runtime() - time
-        nodes_needed, head_start_time = req_nodes - len(free_nodes), time
-        for rj in sorted(running_jobs, key=remaining_runtime):
-            if nodes_needed <= 0:
-                break
-            nodes_needed -= len(rj.assigned_nodes)
-            head_start_time = time + remaining_runtime(rj)
-        return nodes_needed <= 0 and head_start_time < head.get_estimated_runtime()
-
+    backfill = EasyBackfill(r_jobs, float(system["time"]))
     for job in p_jobs:
         if len(f_nodes) == 0:
             break
 
         req_nodes = job.num_nodes_min
         if req_nodes <= len(f_nodes):
-            if easy and delays_head(job, req_nodes, p_jobs[0], r_jobs, f_nodes, system):
+            if easy and backfill.delays_head(job, req_nodes, p_jobs[0], len(f_nodes)):
                 continue
-            job.assign(f_nodes[:req_nodes])
+            job.assign(f_nodes.allocate(req_nodes))
             job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
-            del f_nodes[:req_nodes]
             p_jobs.remove(job)
+            backfill.start(job, req_nodes)
             Logger.log_event(EventType.START, job, job.assigned_nodes)
 
 
@@ -73,7 +76,16 @@ def allocate_resources(job: Job, required_nodes: list[Node], agreements):
 
 # calculate a list of nodes with a maximum size of required_nodes that can by reallocated from running malleable jobs
 # malleable jobs with the most nodes above min nodes will be used first
-def select_shrink_jobs(rm_jobs: list[Job], required_nodes: list[Node], agreements):
+def select_shrink_jobs(rm_jobs: list[Job], required_nodes: list[Node], agreements, arrays=None):
+    if shrink_by_marginal_speedup:
+        target = arrays.num_nodes_min if arrays is not None else None
+        shrink_jobs = select_shrink_by_marginal_speedup(
+            rm_jobs, required_nodes, lambda j: j.num_nodes_min, agreements, arrays, target
+        )
+        return shrink_jobs or dict()
+    if arrays is not None:
+        priority = arrays.assigned - arrays.num_nodes_min
+        return arrays.select_shrink_jobs(required_nodes, arrays.num_nodes_min, priority) or dict()
     jobs_to_shrink = dict()
     for job in sorted(rm_jobs, key=get_min_job_priority, reverse=True):
         nodes_to_shrink = allocate_resources(job, required_nodes, agreements)
@@ -84,60 +96,90 @@ def select_shrink_jobs(rm_jobs: list[Job], required_nodes: list[Node], agreement
 
 
 # shrinks running malleable jobs if those nodes can run pending jobs
-def schedule_pending_job(pending_jobs: list[Job], rm_jobs: list[Job], agreements):
+@Profiler.profile("schedule_pending_job")
+def schedule_pending_job(pending_jobs: list[Job], rm_jobs: list[Job], agreements, arrays=None):
     for job in pending_jobs:
         required_nodes = job.num_nodes_min
-        shrinkables = select_shrink_jobs(rm_jobs, required_nodes, agreements)
+        shrinkables = select_shrink_jobs(rm_jobs, required_nodes, agreements, arrays)
+        if not ReconfigurationCost.is_worth_shrink(job, shrinkables):
+            continue
         for s_job, nodes in shrinkables.items():
-            agreements.add_agreement(job, nodes)
+            agreements.add_agreement(job, nodes, s_job.get_next_scheduling_point())
             Logger.log_event(EventType.AGREEMENT_ADDED, (s_job, job), nodes)
             s_job.remove(nodes)
             Logger.log_event(EventType.SHRINK, s_job, nodes)
+            if arrays is not None:
+                arrays.update(s_job)
 
 
 # expands malleable jobs with all remaining free nodes.
 # jobs with the fewest amount of nodes above min_nodes will be expanded first
-def expand_running_malleable_jobs(rm_jobs: list[Job], free_nodes: list[Node]):
-    for rm_job in sorted(rm_jobs, key=get_min_job_priority):
+@Profiler.profile("expand_running_malleable_jobs")
+def expand_running_malleable_jobs(rm_jobs: list[Job], free_nodes: FreeNodeSet, arrays=None):
+    if arrays is not None:
+        candidates = arrays.get_expand_candidates(arrays.num_nodes_max, arrays.assigned - arrays.num_nodes_min)
+    else:
+        candidates = [(j, j.num_nodes_max - len(j.assigned_nodes)) for j in sorted(rm_jobs, key=get_min_job_priority)]
+    for rm_job, max_new_nodes in candidates:
         if len(free_nodes) == 0:
             break
 
-        max_new_nodes = rm_job.num_nodes_max - len(rm_job.assigned_nodes)
         if max_new_nodes > 0:
             node_amount_to_assign = min(max_new_nodes, len(free_nodes))
-            nodes_to_assign = free_nodes[:node_amount_to_assign]
+            if not ReconfigurationCost.is_worth_expand(rm_job, node_amount_to_assign):
+                continue
+            nodes_to_assign = free_nodes.allocate(node_amount_to_assign)
             rm_job.assign(nodes_to_assign)
-            del free_nodes[:node_amount_to_assign]
             Logger.log_event(EventType.EXPAND, rm_job, nodes_to_assign)
+            if arrays is not None:
+                arrays.update(rm_job)
 
 
+@Recorder.record_invocation
+@Profiler.profile_invocation
 def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
     injectExtension(jobs, nodes, system)
-    global agreements
+    global agreements, state
 
     # filter jobs and nodes
-    p_jobs = [j for j in jobs if j.state is JobState.PENDING]
-    r_jobs = [j for j in jobs if j.state is JobState.RUNNING]
-    rm_jobs = [j for j in r_jobs if j.type is JobType.MALLEABLE]
-    f_nodes = [n for n in nodes if n.state is NodeState.FREE]
+    state.update(jobs, nodes)
+    if state.is_unchanged(system, agreements):  # no decision possible, see StateIndex
+        return
+    p_jobs = state.get_pending_jobs()
+    r_jobs = state.get_running_jobs()
+    rm_jobs = ReconfigurationCost.get_resizable_jobs(state.get_running_malleable_jobs())
+    f_nodes = state.get_free_nodes()
 
     # schedule jobs with agreements first
-    agreements.resolve_agreements(p_jobs, f_nodes)
+    with Profiler.phase("resolve_agreements"):
+        agreements.resolve_agreements(p_jobs, f_nodes)
+        agreements.resolve_partial_agreements(r_jobs, f_nodes)
+        agreements.cancel_agreements(p_jobs, f_nodes)
 
     # remove pending jobs and free nodes with existing agreements
-    free_nodes = [n for n in f_nodes if not agreements.has_agreement(n)]
+    free_nodes = state.get_free_node_set(agreements.get_unavailable_nodes())
     pending_jobs = [j for j in p_jobs if not agreements.has_agreement(j)]
 
     # schedule initial allocation
     initial_allocation(pending_jobs, r_jobs, free_nodes, system)
 
+    # run pending jobs on idle agreement nodes if they end before the agreement is due
+    agreements.lend_nodes(pending_jobs, f_nodes, float(system["time"]))
+
+    # pack running malleable jobs into arrays if enabled
+    arrays = PolicyArrays.create(rm_jobs, agreements)
+
     # schedule pending jobs by shrinking malleable jobs
     if len(pending_jobs) > 0 and len(rm_jobs) > 0:
-        schedule_pending_job(pending_jobs, rm_jobs, agreements)
+        schedule_pending_job(pending_jobs, rm_jobs, agreements, arrays)
 
     # expand running malleable jobs if possible
     if len(free_nodes) > 0 and len(rm_jobs) > 0:
-        expand_running_malleable_jobs(rm_jobs, free_nodes)
+        if expand_by_marginal_speedup:
+            max_target = arrays.num_nodes_max if arrays is not None else None
+            expand_jobs_by_marginal_speedup(rm_jobs, free_nodes, lambda j: j.num_nodes_max, arrays, max_target)
+        else:
+            expand_running_malleable_jobs(rm_jobs, free_nodes, arrays)
 
 
 if __name__ == "__main__":
@@ -147,3 +189,5 @@ if __name__ == "__main__":
     except Exception as e:
         print("\nScheduler Error for min_steal_agreement.py")
         raise e
+    finally:
+        Logger.close()
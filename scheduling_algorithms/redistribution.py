@@ -0,0 +1,209 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Scheduling Algorithm Redistribution:
+# on job submission and completion, the nodes are distributed between all running malleable jobs and the pending jobs
+# that can start (FCFS) to maximize the summed amdahl speedup
+# 1. every job gets its min_nodes, the remaining nodes are handed out one at a time to the malleable job with the
+#    highest marginal speedup up to max_nodes (exact for concave speedups)
+# 2. pending jobs are started on free nodes, missing min_nodes are shrunk from running malleable jobs above their
+#    target, shrunken nodes are tied to the pending job, pending job wait for nodes to be free
+# 3. running malleable jobs below their target are expanded with the remaining free nodes, then with nodes shrunk from
+#    running malleable jobs above their target, shrunken nodes are tied to the expanded job
+# at most max_reconfigurations shrinks and expands are issued per invocation, other invocations only resolve agreements
+from elastisim_python import JobState, JobType, NodeState, InvocationType, pass_algorithm
+from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode
+from extension.ElastiSimExtension import *
+from extension.AgreementHandler import AgreementHandler, DirectAgreementHandler
+from extension.StateIndex import StateIndex
+from extension.FreeNodeSet import FreeNodeSet
+from extension.ReconfigurationCost import ReconfigurationCost
+from extension.SpeedupPolicy import get_marginal_speedup
+from extension.WaterFilling import WaterFilling
+
+
+state = StateIndex()
+partial_start = False  # start malleable jobs once num_nodes_min of their agreement nodes are free
+agreements = DirectAgreementHandler(partial_start=partial_start, state=state)
+max_reconfigurations = 16  # shrinks and expands per invocation
+redistribution_invocations = (
+    InvocationType.INVOKE_JOB_SUBMIT,
+    InvocationType.INVOKE_JOB_COMPLETED,
+    InvocationType.INVOKE_JOB_KILLED,
+)
+
+
+# selects the pending jobs in FCFS order whose min_nodes fit into the given amount of nodes
+def select_pending_jobs(p_jobs: list[Job], node_amount: int):
+    selected_jobs = []
+    for job in p_jobs:
+        if job.num_nodes_min > node_amount:
+            break
+        node_amount -= job.num_nodes_min
+        selected_jobs.append(job)
+    return selected_jobs
+
+
+# calculates the node amount of every job, starting from min_nodes every remaining node goes to the malleable job
+# with the highest marginal speedup
+@Profiler.profile("get_node_targets")
+def get_node_targets(jobs: list[Job], node_amount: int):
+    filling = WaterFilling(
+        [j for j in jobs if j.type is JobType.MALLEABLE and j.num_nodes_min < j.num_nodes_max],
+        lambda j, amount: -get_marginal_speedup(j, j.num_nodes_min + amount),
+    )
+    for _ in range(node_amount):
+        job = filling.top()
+        if job is None:
+            break
+        filling.take(job.num_nodes_min + filling.amounts[job] + 1 < job.num_nodes_max)
+    return {j: j.num_nodes_min + filling.amounts.get(j, 0) for j in jobs}
+
+
+# selects nodes of running malleable jobs above their target, returns None if not enough nodes can be shrunk
+# with partial, the nodes that can be shrunk are returned even if they are less than required_nodes
+def select_shrink_jobs(rm_jobs: list[Job], targets: dict, required_nodes: int, reconfigurations: int, partial=False):
+    jobs_to_shrink = dict()
+    for job in rm_jobs:
+        if required_nodes == 0 or len(jobs_to_shrink) == reconfigurations:
+            break
+        nodes = [n for n in job.assigned_nodes[targets[job]:] if not agreements.has_agreement(n)][:required_nodes]
+        if len(nodes) > 0:
+            jobs_to_shrink[job] = nodes
+            required_nodes -= len(nodes)
+    return jobs_to_shrink if required_nodes == 0 or partial else None
+
+
+# starts the selected pending jobs with their target on free nodes
+# if the free nodes do not suffice, the jobs start with min_nodes by shrinking running malleable jobs
+# returns the amount of issued shrinks
+@Profiler.profile("start_pending_jobs")
+def start_pending_jobs(s_jobs: list[Job], rm_jobs: list[Job], targets: dict, free_nodes: FreeNodeSet, reconfigurations):
+    shrinks = 0
+    for job in s_jobs:
+        if job.num_nodes_min <= len(free_nodes):
+            req_nodes = min(targets[job], len(free_nodes))
+            job.assign(free_nodes.allocate(req_nodes))
+            job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
+            Logger.log_event(EventType.START, job, job.assigned_nodes)
+            continue
+
+        shrinkables = select_shrink_jobs(
+            rm_jobs, targets, job.num_nodes_min - len(free_nodes), reconfigurations - shrinks
+        )
+        if shrinkables is None or not ReconfigurationCost.is_worth_shrink(job, shrinkables):  # keep FCFS order
+            break
+        if len(free_nodes) > 0:
+            agreement_nodes = free_nodes.allocate(len(free_nodes))
+            agreements.add_agreement(job, agreement_nodes, Job.time)
+            Logger.log_event(EventType.AGREEMENT_ADDED, job, agreement_nodes)
+        for s_job, nodes in shrinkables.items():
+            agreements.add_agreement(job, nodes, s_job.get_next_scheduling_point())
+            Logger.log_event(EventType.AGREEMENT_ADDED, (s_job, job), nodes)
+            s_job.remove(nodes)
+            Logger.log_event(EventType.SHRINK, s_job, nodes)
+            shrinks += 1
+    return shrinks
+
+
+# expands running malleable jobs below their target with the free nodes
+# returns the amount of issued expands
+@Profiler.profile("expand_running_malleable_jobs")
+def expand_running_malleable_jobs(rm_jobs: list[Job], targets: dict, free_nodes: FreeNodeSet, reconfigurations):
+    expands = 0
+    for job in rm_jobs:
+        if len(free_nodes) == 0 or expands == reconfigurations:
+            break
+        node_amount = min(targets[job] - len(job.assigned_nodes), len(free_nodes))
+        if node_amount > 0 and ReconfigurationCost.is_worth_expand(job, node_amount):
+            nodes_to_assign = free_nodes.allocate(node_amount)
+            job.assign(nodes_to_assign)
+            Logger.log_event(EventType.EXPAND, job, nodes_to_assign)
+            expands += 1
+    return expands
+
+
+# expands running malleable jobs below their target by shrinking running malleable jobs above their target
+# the shrunken nodes are tied to the expanded job, which is expanded once they are free (see resolve_partial_agreements)
+# every shrink and the expand of a job count as one reconfiguration
+@Profiler.profile("redistribute_running_jobs")
+def redistribute_running_jobs(rm_jobs: list[Job], targets: dict, reconfigurations):
+    donors = [j for j in rm_jobs if len(j.assigned_nodes) > targets[j]]
+    for job in rm_jobs:
+        if len(donors) == 0 or reconfigurations < 2:
+            break
+        node_amount = targets[job] - len(job.assigned_nodes)
+        if agreements.has_agreement(job):
+            node_amount -= len(agreements.get_job_agreement_nodes(job))
+        if node_amount <= 0 or not ReconfigurationCost.is_worth_expand(job, node_amount):
+            continue
+
+        shrinkables = select_shrink_jobs(donors, targets, node_amount, reconfigurations - 1, partial=True)
+        if len(shrinkables) == 0:
+            break
+        if not ReconfigurationCost.is_worth_shrink(job, shrinkables):
+            continue
+        for s_job, nodes in shrinkables.items():
+            agreements.add_expand_agreement(job, nodes, s_job.get_next_scheduling_point())
+            Logger.log_event(EventType.AGREEMENT_ADDED, (s_job, job), nodes)
+            s_job.remove(nodes)
+            Logger.log_event(EventType.SHRINK, s_job, nodes)
+        donors = [j for j in donors if len(j.assigned_nodes) > targets[j]]
+        reconfigurations -= len(shrinkables) + 1
+
+
+@Recorder.record_invocation
+@Profiler.profile_invocation
+def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
+    injectExtension(jobs, nodes, system)
+    global agreements, state
+
+    # filter jobs and nodes
+    state.update(jobs, nodes)
+    if state.is_unchanged(system, agreements):  # no decision possible, see StateIndex
+        return
+    p_jobs = state.get_pending_jobs()
+    r_jobs = state.get_running_jobs()
+    rm_jobs = ReconfigurationCost.get_resizable_jobs(state.get_running_malleable_jobs())
+    f_nodes = state.get_free_nodes()
+
+    # handle agreements
+    with Profiler.phase("resolve_agreements"):
+        agreements.resolve_agreements(p_jobs, f_nodes)
+        agreements.resolve_partial_agreements(r_jobs, f_nodes)
+    invocation_type = system.get("invocation_type")  # unknown invocations redistribute
+    if invocation_type is not None and invocation_type not in redistribution_invocations:
+        return
+
+    # remove pending jobs and free nodes that have an existing agreement
+    pending_jobs = [j for j in p_jobs if not agreements.has_agreement(j)]
+    free_nodes = state.get_free_node_set(agreements.get_unavailable_nodes())
+
+    # distribute the free nodes and the nodes of malleable jobs above min_nodes
+    node_amount = len(free_nodes) + sum(len(j.assigned_nodes) - j.num_nodes_min for j in rm_jobs)
+    s_jobs = select_pending_jobs(pending_jobs, node_amount)
+    node_amount -= sum(j.num_nodes_min for j in s_jobs)
+    targets = get_node_targets(rm_jobs + s_jobs, node_amount)
+
+    # start pending jobs, then expand running malleable jobs with free nodes and with nodes of jobs above their target
+    reconfigurations = max_reconfigurations - start_pending_jobs(s_jobs, rm_jobs, targets, free_nodes, max_reconfigurations)
+    reconfigurations -= expand_running_malleable_jobs(rm_jobs, targets, free_nodes, reconfigurations)
+    redistribute_running_jobs(rm_jobs, targets, reconfigurations)
+
+
+if __name__ == "__main__":
+    url = "ipc:///tmp/elastisim.ipc"
+    try:
+        pass_algorithm(schedule, url)
+    except Exception as e:
+        print("\nScheduler Error for redistribution.py")
+        raise e
+    finally:
+        Logger.close()
@@ -13,15 +13,23 @@
 # Jobs are assigned with their maximum possible amount of nodes and will not be reassigned
 
 from extension.ElastiSimExtension import *
+from extension.StateIndex import StateIndex
 from elastisim_python import JobState, NodeState, pass_algorithm
 from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode, InvocationType
 
 
+state = StateIndex()
+
+
+@Recorder.record_invocation
+@Profiler.profile_invocation
 def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
     injectExtension(jobs, nodes, system)
-    free_nodes = [node for node in nodes if node.state == NodeState.FREE]
-    pending_jobs = [job for job in jobs if job.state is JobState.PENDING]
-    running_jobs = [job for job in jobs if job.state is JobState.RUNNING]
+    state.update(jobs, nodes)
+    if state.is_unchanged(system):  # no decision possible, see StateIndex
+        return
+    free_nodes = state.get_free_node_set()
+    pending_jobs = state.get_pending_jobs()
 
     for job in pending_jobs:
         if len(free_nodes) == 0:
@@ -29,9 +37,8 @@ def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict)
 
         if job.num_nodes_pref <= len(free_nodes):
             nodes_to_assign = min(job.num_nodes_pref, len(free_nodes))
-            job.assign(free_nodes[:nodes_to_assign])
+            job.assign(free_nodes.allocate(nodes_to_assign))
             job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
-            del free_nodes[:nodes_to_assign]
             pending_jobs.remove(job)
             Logger.log_event(EventType.START, job, job.assigned_nodes)
 
@@ -43,3 +50,5 @@ if __name__ == "__main__":
     except Exception as e:
         print("\nScheduler Error for rigid_backfill.py")
         raise e
+    finally:
+        Logger.close()
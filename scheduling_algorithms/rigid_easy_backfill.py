@@ -13,29 +13,26 @@
 # Jobs are assigned with their maximum possible amount of nodes and will not be reassigned
 
 from extension.ElastiSimExtension import *
+from extension.StateIndex import StateIndex
+from extension.EasyBackfill import EasyBackfill
 from elastisim_python import JobState, NodeState, pass_algorithm
 from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode, InvocationType
 
-# checks if starting this job delays queue head.
-def delays_head(job, req_nodes, head, running_jobs, free_nodes, system):
-    if job == head:
-        return False
-    time = float(system["time"])
-    remaining_runtime = lambda j: j.start_time + j.get_estimated_runtime() - time
-    nodes_needed, head_start_time = req_nodes - len(free_nodes), time
-    for rj in sorted(running_jobs, key=remaining_runtime):
-        if nodes_needed <= 0:
-            break
-        nodes_needed -= len(rj.assigned_nodes)
-        head_start_time = time + remaining_runtime(rj)
-    return nodes_needed <= 0 and head_start_time < head.get_estimated_runtime()
+
+state = StateIndex()
 
 
+@Recorder.record_invocation
+@Profiler.profile_invocation
 def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
     injectExtension(jobs, nodes, system)
-    free_nodes = [node for node in nodes if node.state == NodeState.FREE]
-    p_jobs = [job for job in jobs if job.state is JobState.PENDING]
-    r_jobs = [job for job in jobs if job.state is JobState.RUNNING]
+    state.update(jobs, nodes)
+    if state.is_unchanged(system):  # no decision possible, see StateIndex
+        return
+    free_nodes = state.get_free_node_set()
+    p_jobs = state.get_pending_jobs()
+    r_jobs = state.get_running_jobs()
+    backfill = EasyBackfill(r_jobs, float(system["time"]), lambda j: j.num_nodes_pref)
 
     for job in p_jobs:
         if len(free_nodes) == 0:
@@ -43,12 +40,12 @@ def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict)
 
         req_nodes = job.num_nodes_pref
         if req_nodes <= len(free_nodes):
-            if delays_head(job, req_nodes, p_jobs[0], r_jobs, free_nodes, system):
+            if backfill.delays_head(job, req_nodes, p_jobs[0], len(free_nodes)):
                 continue
-            job.assign(free_nodes[:req_nodes])
+            job.assign(free_nodes.allocate(req_nodes))
             job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
-            del free_nodes[:req_nodes]
             p_jobs.remove(job)
+            backfill.start(job, req_nodes)
             Logger.log_event(EventType.START, job, job.assigned_nodes)
 
 
@@ -59,3 +56,5 @@ if __name__ == "__main__":
     except Exception as e:
         print("\nScheduler Error for rigid_easy_backfill.py")
         raise e
+    finally:
+        Logger.close()
@@ -15,21 +15,29 @@
 from elastisim_python import JobState, JobType, NodeState, pass_algorithm
 from elastisim_python import Job as ElastiSimJob, Node as ElastiSimNode
 from extension.ElastiSimExtension import *
+from extension.StateIndex import StateIndex
 
 
+state = StateIndex()
+
+
+@Recorder.record_invocation
+@Profiler.profile_invocation
 def schedule(jobs: list[ElastiSimJob], nodes: list[ElastiSimNode], system: dict):
     injectExtension(jobs, nodes, system)
-    free_nodes = [node for node in nodes if node.state == NodeState.FREE]
-    pending_jobs = [job for job in jobs if job.state is JobState.PENDING]
+    state.update(jobs, nodes)
+    if state.is_unchanged(system):  # no decision possible, see StateIndex
+        return
+    free_nodes = state.get_free_node_set()
+    pending_jobs = state.get_pending_jobs()
 
     for job in pending_jobs:
         if len(free_nodes) < job.num_nodes_min:
             break
 
         nodes_to_assign = min(len(free_nodes), job.num_nodes_max)
-        job.assign(free_nodes[:nodes_to_assign])
+        job.assign(free_nodes.allocate(nodes_to_assign))
         job.assign_num_gpus_per_node(job.num_gpus_per_node_max)
-        del free_nodes[:nodes_to_assign]
         Logger.log_event(EventType.START, job, job.assigned_nodes)
 
 
@@ -40,3 +48,5 @@ if __name__ == "__main__":
     except Exception as e:
         print("\nScheduler Error for fifo.py")
         raise e
+    finally:
+        Logger.close()
@@ -0,0 +1,272 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Microbenchmark of the schedule() functions on synthetic cluster states, runs without ElastiSim.
+# For every algorithm and every combination of node amount and pending job amount a state is built:
+# running jobs allocate the given share of the nodes, the pending jobs wait in the queue and, for algorithms with an
+# agreement handler, the given share of the pending jobs has an agreement on nodes that are about to be released.
+# Two invocations are measured, the first one (cold, INVOKE_JOB_SUBMIT) on the new state and the second one
+# (warm, INVOKE_PERIODIC) after its decisions are applied and the agreement nodes are released.
+# Every configuration runs in its own process, configurations of an algorithm that are at least as large as a
+# configuration that timed out are skipped. The results are written as csv, one row per algorithm and configuration.
+#
+# python3 scripts/offline/benchmarkSchedulers.py -a "scheduling_algorithms/*.py" -o benchmark.csv --quick
+# python3 scripts/offline/benchmarkSchedulers.py -a scheduling_algorithms/min_agreement.py --nodes 32,65536 --pending 10,50000
+# With --arrays the malleable schedulers run with PolicyArrays.enabled = True (requires numpy).
+import csv
+import getopt
+import glob
+import math
+import multiprocessing as mp
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time as timer
+import tracemalloc
+
+from offlineDriver import OfflineCluster, load_algorithm
+from elastisim_python import JobState, NodeState, InvocationType
+
+
+default_nodes = [32, 256, 2048, 16384, 65536]
+default_pending = [10, 100, 1000, 10000, 50000]
+quick_nodes = [32, 256, 2048]
+quick_pending = [10, 100, 1000]
+header = [
+    "version", "algorithm", "nodes", "pending_jobs", "running_jobs", "malleable_share", "agreement_density",
+    "policy_arrays", "agreements", "cold_seconds", "cold_min_seconds", "warm_seconds", "warm_min_seconds", "peak_memory_bytes", "status",
+]
+
+
+# job of a jobs.json with a power of 2 as num_nodes_pref, malleable jobs may use half to double of it
+def create_job_spec(randomizer, identifier, max_nodes, num_nodes, malleable_share):
+    num_nodes_pref = 2 ** randomizer.randint(0, int(math.log2(max_nodes)))
+    arguments = {
+        "divide": 100,
+        "parallel_percentage": randomizer.choice([0.95, 0.99, 0.995, 0.999]),
+        "flops": randomizer.uniform(1e13, 1e16) * num_nodes_pref,
+        "num_nodes_pref": num_nodes_pref,
+        "id": identifier,
+    }
+    if randomizer.random() * 100 < malleable_share:
+        num_nodes_min, num_nodes_max = max(1, num_nodes_pref // 2), min(num_nodes, num_nodes_pref * 2)
+        return {"type": "MALLEABLE", "submit_time": 0, "num_nodes_min": num_nodes_min, "num_nodes_max": num_nodes_max,
+                "arguments": arguments}
+    return {"type": "RIGID", "submit_time": 0, "num_nodes": num_nodes_pref, "arguments": arguments}
+
+
+# builds a cluster with running jobs on the utilization share of the nodes and num_pending pending jobs
+# returns the cluster and the agreements (job, node ids) on nodes that are allocated but no longer used by a job
+def build_cluster(num_nodes, num_pending, malleable_share, agreement_density, utilization=0.9, seed=0):
+    randomizer = random.Random(seed)
+    max_nodes = max(1, num_nodes // 32)
+    running_specs = []
+    allocated = 0
+    while True:
+        job_spec = create_job_spec(randomizer, len(running_specs), max_nodes, num_nodes, malleable_share)
+        node_amount = job_spec.get("num_nodes") or randomizer.randint(job_spec["num_nodes_min"], job_spec["num_nodes_max"])
+        if allocated + node_amount > num_nodes * utilization:
+            break
+        running_specs.append((job_spec, node_amount))
+        allocated += node_amount
+    job_specs = [s for s, _ in running_specs]
+    job_specs += [create_job_spec(randomizer, len(job_specs) + i, max_nodes, num_nodes, malleable_share)
+                  for i in range(num_pending)]
+
+    cluster = OfflineCluster(job_specs, num_nodes)
+    cluster.time = 3600.0
+    cluster.submit_jobs()
+    node_ids = iter(range(num_nodes))
+    for job, (_, node_amount) in zip(cluster.jobs, running_specs):
+        job.assigned_nodes = [cluster.nodes[next(node_ids)] for _ in range(node_amount)]
+        job.state = JobState.RUNNING
+        job.start_time = randomizer.uniform(0.0, cluster.time)
+        cluster.remaining_flops[job.identifier] = float(job.arguments["flops"]) / 2
+        for node in job.assigned_nodes:
+            node.state = NodeState.ALLOCATED
+            node.assigned_job_ids.add(job.identifier)
+
+    agreements = []
+    for job in cluster.jobs[len(running_specs): len(running_specs) + int(num_pending * agreement_density)]:
+        agreement_nodes = [cluster.nodes[i] for _, i in zip(range(job.num_nodes_min), node_ids)]
+        if len(agreement_nodes) < job.num_nodes_min:
+            break
+        for node in agreement_nodes:
+            node.state = NodeState.ALLOCATED
+        agreements.append((job, [n.identifier for n in agreement_nodes]))
+    return cluster, agreements
+
+
+# measures a single invocation, with tracemalloc the peak memory of the invocation is returned instead of the time
+def measure(algorithm, jobs, nodes, system, trace_memory=False):
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            algorithm.schedule(jobs, nodes, system)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    start = timer.perf_counter()
+    algorithm.schedule(jobs, nodes, system)
+    return timer.perf_counter() - start
+
+
+def run_configuration(algorithm_path, num_nodes, num_pending, malleable_share, agreement_density, repetitions, arrays):
+    cold, warm = [], []
+    result = {"running_jobs": 0, "agreements": 0, "peak_memory_bytes": None}
+    for repetition in range(repetitions + 1):
+        trace_memory = repetition == repetitions
+        algorithm = load_algorithm(algorithm_path)
+        if hasattr(algorithm, "PolicyArrays"):
+            algorithm.PolicyArrays.enabled = arrays
+        cluster, agreements = build_cluster(num_nodes, num_pending, malleable_share, agreement_density)
+        jobs, nodes = cluster.get_state()
+        handler = getattr(algorithm, "agreements", None)
+        if handler is None:
+            agreements = []
+        for job, node_ids in agreements:
+            handler.add_agreement(jobs[job.identifier], [nodes[i] for i in node_ids])
+        result["running_jobs"] = sum(1 for j in cluster.jobs if j.state is JobState.RUNNING)
+        result["agreements"] = len(agreements)
+
+        try:
+            system = {"time": cluster.time, "invocation_type": InvocationType.INVOKE_JOB_SUBMIT}
+            value = measure(algorithm, jobs, nodes, system, trace_memory)
+            if trace_memory:
+                result["peak_memory_bytes"] = value
+            else:
+                cold.append(value)
+
+            cluster.apply(jobs)
+            cluster.time += 60.0
+            jobs, nodes = cluster.get_state()
+            system = {"time": cluster.time, "invocation_type": InvocationType.INVOKE_PERIODIC}
+            value = measure(algorithm, jobs, nodes, system)
+            if not trace_memory:
+                warm.append(value)
+        finally:
+            algorithm.Logger.close()
+
+    cold.sort()
+    warm.sort()
+    result.update(
+        cold_seconds=cold[len(cold) // 2], cold_min_seconds=cold[0],
+        warm_seconds=warm[len(warm) // 2], warm_min_seconds=warm[0],
+    )
+    return result
+
+
+def run_configuration_process(queue, directory, *args):
+    os.chdir(directory)
+    try:
+        queue.put(("ok", run_configuration(*args)))
+    except Exception as e:
+        queue.put((repr(e), dict()))
+
+
+# runs the configuration in its own process, returns the status and the measurements
+def run_isolated(directory, timeout, *args):
+    queue = mp.Queue()
+    process = mp.Process(target=run_configuration_process, args=(queue, directory) + args)
+    process.start()
+    try:
+        return queue.get(timeout=timeout)
+    except Exception:
+        return "timeout", dict()
+    finally:
+        process.kill()
+        process.join()
+
+
+def get_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def get_arguments(argv):
+    args = {
+        "algorithms": [],
+        "output": None,
+        "nodes": default_nodes,
+        "pending": default_pending,
+        "malleable_share": 50,
+        "agreement_density": 0.1,
+        "repetitions": 5,
+        "timeout": 600.0,
+        "arrays": False,
+    }
+    arg_names = ["algorithm=", "output=", "nodes=", "pending=", "malleable_share=", "agreement_density=",
+                 "repetitions=", "timeout=", "quick", "arrays"]
+    opts, _ = getopt.getopt(argv, "a:o:r:", arg_names)
+    for opt, arg in opts:
+        if opt in ("-a", "--algorithm"):
+            args["algorithms"] += [os.path.abspath(p) for p in sorted(glob.glob(arg)) if os.path.isfile(p)]
+        elif opt in ("-o", "--output"):
+            args["output"] = os.path.abspath(arg)
+        elif opt == "--nodes":
+            args["nodes"] = [int(n) for n in arg.split(",")]
+        elif opt == "--pending":
+            args["pending"] = [int(n) for n in arg.split(",")]
+        elif opt == "--malleable_share":
+            args["malleable_share"] = int(arg)
+        elif opt == "--agreement_density":
+            args["agreement_density"] = float(arg)
+        elif opt in ("-r", "--repetitions"):
+            args["repetitions"] = int(arg)
+        elif opt == "--timeout":
+            args["timeout"] = float(arg)
+        elif opt == "--quick":
+            args["nodes"], args["pending"] = quick_nodes, quick_pending
+        elif opt == "--arrays":
+            args["arrays"] = True
+    return args
+
+
+def start_benchmark(sys_args):
+    args = get_arguments(sys_args)
+    assert len(args["algorithms"]) > 0
+    version = get_version()
+    output = open(args["output"], "w") if args["output"] is not None else sys.stdout
+    writer = csv.writer(output)
+    writer.writerow(header)
+    output.flush()
+
+    # the logger of the algorithms writes into a temporary data/output folder
+    directory = tempfile.mkdtemp(prefix="benchmark_")
+    os.makedirs(os.path.join(directory, "data", "output"))
+    for algorithm_path in args["algorithms"]:
+        timed_out = []
+        for num_nodes in sorted(args["nodes"]):
+            for num_pending in sorted(args["pending"]):
+                configuration = (num_nodes, num_pending, args["malleable_share"], args["agreement_density"])
+                if any(num_nodes >= n and num_pending >= p for n, p in timed_out):
+                    status, result = "skipped", dict()
+                else:
+                    status, result = run_isolated(directory, args["timeout"], algorithm_path, *configuration,
+                                                  args["repetitions"], args["arrays"])
+                if status == "timeout":
+                    timed_out.append((num_nodes, num_pending))
+                row = {"version": version, "algorithm": os.path.basename(algorithm_path), "nodes": num_nodes,
+                       "pending_jobs": num_pending, "malleable_share": args["malleable_share"],
+                       "agreement_density": args["agreement_density"], "policy_arrays": args["arrays"], "status": status,
+                       **result}
+                writer.writerow([row.get(k, "") for k in header])
+                output.flush()
+    if output is not sys.stdout:
+        output.close()
+
+
+if __name__ == "__main__":
+    start_benchmark(sys.argv[1:])
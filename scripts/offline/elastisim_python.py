@@ -0,0 +1,119 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Pure-Python stand-in for the elastisim_python package, used to call schedule() functions without ElastiSim.
+# Provides the classes and enums in the way the scheduling algorithms use them, offlineDriver.py puts this folder
+# in front of the python path so the algorithms import it instead of the real package.
+from enum import Enum
+
+
+class JobType(Enum):
+    RIGID = 0
+    MOLDABLE = 1
+    MALLEABLE = 2
+    EVOLVING = 3
+    ADAPTIVE = 4
+
+
+class JobState(Enum):
+    PENDING = 0
+    PENDING_RECONFIGURATION = 1
+    RUNNING = 2
+    IN_RECONFIGURATION = 3
+    COMPLETED = 4
+    KILLED = 5
+
+
+class NodeType(Enum):
+    COMPUTE_NODE = 0
+
+
+class NodeState(Enum):
+    FREE = 0
+    RESERVED = 1
+    ALLOCATED = 2
+
+
+class InvocationType(Enum):
+    INVOKE_PERIODIC = 0
+    INVOKE_JOB_SUBMIT = 1
+    INVOKE_JOB_COMPLETED = 2
+    INVOKE_JOB_KILLED = 3
+    INVOKE_SCHEDULING_POINT = 4
+    INVOKE_EVOLVING_REQUEST = 5
+
+
+class Node:
+    def __init__(self, identifier, state=NodeState.FREE, assigned_job_ids=None):
+        self.identifier = identifier
+        self.type = NodeType.COMPUTE_NODE
+        self.state = state
+        self.assigned_job_ids = set() if assigned_job_ids is None else set(assigned_job_ids)
+
+    def __repr__(self):
+        return f"Node({self.identifier})"
+
+
+class Job:
+    def __init__(
+        self,
+        identifier,
+        type,
+        state=JobState.PENDING,
+        submit_time=0.0,
+        num_nodes=0,
+        num_nodes_min=0,
+        num_nodes_max=0,
+        arguments=None,
+        num_gpus_per_node_min=0,
+        num_gpus_per_node_max=0,
+    ):
+        self.identifier = identifier
+        self.type = type
+        self.state = state
+        self.submit_time = submit_time
+        self.start_time = -1.0
+        self.end_time = -1.0
+        self.wall_time = -1.0
+        self.num_nodes = num_nodes
+        self.num_nodes_min = num_nodes_min
+        self.num_nodes_max = num_nodes_max
+        self.num_gpus_per_node = 0
+        self.num_gpus_per_node_min = num_gpus_per_node_min
+        self.num_gpus_per_node_max = num_gpus_per_node_max
+        self.assigned_nodes = []
+        self.assigned_num_gpus_per_node = 0
+        self.arguments = dict() if arguments is None else arguments
+        self.total_phase_count = 1
+        self.completed_phases = 0
+
+    # assigns a node or a list of nodes to the job
+    def assign(self, nodes):
+        for node in nodes if isinstance(nodes, (list, tuple)) else [nodes]:
+            if node in self.assigned_nodes:
+                raise ValueError(f"Node {node.identifier} already assigned to Job {self.identifier}")
+            self.assigned_nodes.append(node)
+            node.assigned_job_ids.add(self.identifier)
+
+    # removes a node or a list of nodes from the job
+    def remove(self, nodes):
+        for node in nodes if isinstance(nodes, (list, tuple)) else [nodes]:
+            self.assigned_nodes.remove(node)
+            node.assigned_job_ids.discard(self.identifier)
+
+    def assign_num_gpus_per_node(self, num_gpus_per_node):
+        self.assigned_num_gpus_per_node = num_gpus_per_node
+
+    def __repr__(self):
+        return f"Job({self.identifier})"
+
+
+def pass_algorithm(schedule, url):
+    raise RuntimeError(f"elastisim_python stand-in cannot connect to {url}, use scripts/offline/offlineDriver.py")
@@ -0,0 +1,402 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Lightweight discrete-event simulation of the inputs written by jsonGenerator.py, used to screen scheduling
+# algorithms and parameters before running them in ElastiSim.
+# The simulation reads configuration.json, jobs.json, application_model.json and crossbar.xml of an input folder
+# and calls the unmodified schedule() function of the algorithms:
+# - jobs run the phases of their application model, a cpu task of an iteration takes flops / node speed seconds
+#   (the UNIFORM pattern computes the flops on every node, TOTAL splits them between the nodes)
+# - the end of every iteration is a scheduling point, node changes of running jobs take effect there and removed
+#   nodes stay allocated until then (the job is PENDING_RECONFIGURATION in between)
+# - the scheduler is invoked periodically and on job submit, job completion and scheduling points as configured
+# - job_statistics.csv and node_utilization.csv are written in the format of ElastiSim, the event log of the
+#   algorithm as usual, into output_files/<input>(<algorithm>)/
+# Reconfiguration costs, network and pfs activity are not simulated.
+#
+# python3 scripts/offline/eventSimulator.py -i input_files/small -a scheduling_algorithms/min_agreement.py
+# python3 scripts/offline/eventSimulator.py -i "input_files/*" -a "scheduling_algorithms/*.py" -d output_files
+import csv
+import getopt
+import glob
+import heapq
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import xml.etree.ElementTree as ElementTree
+
+from offlineDriver import load_algorithm, create_job
+from elastisim_python import Node, JobState, NodeState, InvocationType
+
+
+flops_units = {"f": 1.0, "kf": 1e3, "Mf": 1e6, "Gf": 1e9, "Tf": 1e12, "Pf": 1e15}
+
+# event kinds, events of the same time are processed in this order
+SUBMIT = 0
+ITERATION_END = 1
+PERIODIC = 2
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# files of the configuration are given relative to the ElastiSim container, they are looked up in the input folder
+def get_input_file(input_folder, path):
+    return os.path.join(input_folder, os.path.basename(path))
+
+
+# returns the names and flops per second of all nodes of the clusters in the platform file
+def read_platform(path):
+    node_names, node_speeds = [], []
+    for cluster in ElementTree.parse(path).getroot().iter("cluster"):
+        first, last = (int(n) for n in cluster.get("radical").split("-"))
+        speed = cluster.get("speed")
+        unit = speed.lstrip("0123456789.e+-")
+        node_speed = float(speed[: len(speed) - len(unit)]) * flops_units[unit]
+        for i in range(first, last + 1):
+            node_names.append(f"{cluster.get('prefix', '')}{i}{cluster.get('suffix', '')}")
+            node_speeds.append(node_speed)
+    return node_names, node_speeds
+
+
+# Application model of a job, expressions are compiled once and evaluated with the job arguments and num_nodes
+class ApplicationModel:
+    def __init__(self, model):
+        self.phases = []
+        for phase in model["phases"]:
+            tasks = []
+            for task in phase["tasks"]:
+                if task["type"] == "cpu":
+                    value = task["flops"]
+                elif task["type"] == "delay":
+                    value = task["delay"]
+                else:
+                    raise ValueError(f"Task type {task['type']} is not supported by the event simulator")
+                tasks.append((task["type"], self.compile(value), task.get("computation_pattern", "UNIFORM")))
+            self.phases.append((self.compile(phase.get("iterations", 1)), tasks, phase.get("scheduling_point", True)))
+
+    def compile(self, expression):
+        return compile(str(expression), "<application_model>", "eval")
+
+    def evaluate(self, expression, arguments, num_nodes):
+        return float(eval(expression, {"__builtins__": {}}, {**arguments, "num_nodes": num_nodes}))
+
+    def get_iterations(self, phase, arguments):
+        return max(0, int(self.evaluate(self.phases[phase][0], arguments, 0)))
+
+    def is_scheduling_point(self, phase):
+        return self.phases[phase][2]
+
+    # seconds one iteration of the phase takes on the given nodes
+    def get_iteration_time(self, phase, arguments, num_nodes, node_speed):
+        seconds = 0.0
+        for task_type, expression, pattern in self.phases[phase][1]:
+            value = self.evaluate(expression, arguments, num_nodes)
+            if task_type == "delay":
+                seconds += value
+            elif pattern == "TOTAL":
+                seconds += value / num_nodes / node_speed
+            else:
+                seconds += value / node_speed
+        return seconds
+
+
+# progress of a started job, running_nodes are the node ids the job currently computes on
+class JobProgress:
+    __slots__ = ("model", "phase", "iteration", "running_nodes")
+
+    def __init__(self, model, node_ids):
+        self.model = model
+        self.phase = 0
+        self.iteration = 0
+        self.running_nodes = node_ids
+
+
+class EventSimulator:
+    def __init__(self, algorithm, configuration, job_specs, models, node_names, node_speeds):
+        self.algorithm = algorithm
+        self.configuration = configuration
+        self.job_specs = job_specs
+        self.models = models  # application model path -> ApplicationModel
+        self.node_names = node_names
+        self.node_speeds = node_speeds
+        self.nodes = [Node(i) for i in range(len(node_names))]
+        self.jobs = []  # submitted jobs in submission order
+        self.job_positions = dict()  # job id -> index in jobs
+        self.progress = dict()  # job id -> JobProgress
+        self.events = []
+        self.event_counter = 0
+        self.time = 0.0
+        self.job_statistics = []
+        self.node_utilization = []
+        self.invocations = 0
+
+    def push(self, time, kind, job_id=None):
+        heapq.heappush(self.events, (time, kind, self.event_counter, job_id))
+        self.event_counter += 1
+
+    def get_model(self, job):
+        return self.models[self.job_specs[job.identifier]["application_model"]]
+
+    # jobs compute with the speed of their slowest node
+    def push_iteration_end(self, job):
+        progress = self.progress[job.identifier]
+        node_speed = min(self.node_speeds[i] for i in progress.running_nodes)
+        duration = progress.model.get_iteration_time(progress.phase, job.arguments, len(progress.running_nodes), node_speed)
+        self.push(self.time + duration, ITERATION_END, job.identifier)
+
+    # moves the job to its next iteration, returns False if the job has no iteration left
+    def next_iteration(self, job):
+        progress = self.progress[job.identifier]
+        progress.iteration += 1
+        while progress.phase < len(progress.model.phases):
+            if progress.iteration < progress.model.get_iterations(progress.phase, job.arguments):
+                return True
+            progress.phase += 1
+            progress.iteration = 0
+        return False
+
+    def start_job(self, job):
+        job.state = JobState.RUNNING
+        job.start_time = self.time
+        self.progress[job.identifier] = JobProgress(self.get_model(job), [n.identifier for n in job.assigned_nodes])
+        self.progress[job.identifier].iteration = -1
+        if self.next_iteration(job):
+            self.push_iteration_end(job)
+        else:
+            self.complete_job(job)
+
+    def complete_job(self, job):
+        job.state = JobState.COMPLETED
+        job.end_time = self.time
+        job.assigned_nodes = []
+        del self.progress[job.identifier]
+        self.job_statistics.append([
+            job.identifier, job.type.name.lower(), job.submit_time, job.start_time, job.end_time,
+            job.start_time - job.submit_time, job.end_time - job.start_time, job.end_time - job.submit_time, "completed",
+        ])
+
+    # ends the current iteration of the job, node changes take effect, returns True if it was a scheduling point
+    def end_iteration(self, job):
+        progress = self.progress[job.identifier]
+        scheduling_point = progress.model.is_scheduling_point(progress.phase)
+        if not self.next_iteration(job):
+            self.complete_job(job)
+            return False
+        if job.state is JobState.PENDING_RECONFIGURATION:
+            progress.running_nodes = [n.identifier for n in job.assigned_nodes]
+            job.state = JobState.RUNNING
+        self.push_iteration_end(job)
+        return scheduling_point
+
+    # allocated nodes are the nodes a job computes on and the nodes it will compute on after a reconfiguration
+    def update_nodes(self):
+        allocations = [set() for _ in self.nodes]
+        for job in self.jobs:
+            for node in job.assigned_nodes:
+                allocations[node.identifier].add(job.identifier)
+        for job_id, progress in self.progress.items():
+            for i in progress.running_nodes:
+                allocations[i].add(job_id)
+        for node, job_ids in zip(self.nodes, allocations):
+            state = NodeState.ALLOCATED if len(job_ids) > 0 else NodeState.FREE
+            if state is not node.state or job_ids != node.assigned_job_ids:
+                running_jobs = " ".join(str(i) for i in sorted(job_ids)) or "none"
+                self.node_utilization.append([self.time, self.node_names[node.identifier], state.name.lower(), running_jobs])
+            node.state = state
+            node.assigned_job_ids = job_ids
+
+    # copies the jobs and nodes into new objects, as ElastiSim passes a new state on every invocation
+    def get_state(self):
+        nodes = [Node(n.identifier, n.state, n.assigned_job_ids) for n in self.nodes]
+        jobs = []
+        for job in self.jobs:
+            copy = create_job(job.identifier, self.job_specs[job.identifier])
+            copy.state = job.state
+            copy.start_time = job.start_time
+            copy.end_time = job.end_time
+            copy.assigned_nodes = [nodes[n.identifier] for n in job.assigned_nodes]
+            copy.assigned_num_gpus_per_node = job.assigned_num_gpus_per_node
+            jobs.append(copy)
+        return jobs, nodes
+
+    # applies the node assignments of the algorithm, pending jobs start immediately on free nodes,
+    # running jobs are reconfigured at their next scheduling point
+    def apply(self, jobs):
+        for copy, job in zip(jobs, self.jobs):
+            node_ids = [n.identifier for n in copy.assigned_nodes]
+            old_node_ids = [n.identifier for n in job.assigned_nodes]
+            if node_ids == old_node_ids:
+                continue
+            if job.state not in (JobState.PENDING, JobState.RUNNING, JobState.PENDING_RECONFIGURATION):
+                raise ValueError(f"Job {job.identifier} is {job.state.name} and cannot be assigned nodes")
+            if not job.num_nodes_min <= len(node_ids) <= job.num_nodes_max:
+                raise ValueError(f"Job {job.identifier} assigned {len(node_ids)} nodes, "
+                                 f"allowed are {job.num_nodes_min} to {job.num_nodes_max}")
+            for i in set(node_ids).difference(old_node_ids):
+                if self.nodes[i].state is not NodeState.FREE:
+                    raise ValueError(f"Job {job.identifier} assigned Node {i} allocated by {self.nodes[i].assigned_job_ids}")
+
+            job.assigned_nodes = [self.nodes[i] for i in node_ids]
+            job.assigned_num_gpus_per_node = copy.assigned_num_gpus_per_node
+            if job.state is JobState.PENDING:
+                self.start_job(job)
+            else:
+                job.state = JobState.PENDING_RECONFIGURATION
+            self.update_nodes()
+
+    def invoke(self, invocation_type):
+        jobs, nodes = self.get_state()
+        self.algorithm.schedule(jobs, nodes, {"time": self.time, "invocation_type": invocation_type})
+        self.invocations += 1
+        self.apply(jobs)
+
+    def has_active_jobs(self):
+        return len(self.progress) > 0
+
+    def run(self):
+        configuration = self.configuration
+        for i, job_spec in sorted(enumerate(self.job_specs), key=lambda j: float(j[1]["submit_time"])):
+            self.push(float(job_spec["submit_time"]), SUBMIT, i)
+        scheduling_interval = float(configuration.get("scheduling_interval", 60))
+        if scheduling_interval > 0:
+            self.push(0.0, PERIODIC)
+        self.update_nodes()
+
+        while len(self.events) > 0:
+            self.time = self.events[0][0]
+            invocation_types = set()
+            while len(self.events) > 0 and self.events[0][0] == self.time:
+                _, kind, _, job_id = heapq.heappop(self.events)
+                if kind == SUBMIT:
+                    self.job_positions[job_id] = len(self.jobs)
+                    self.jobs.append(create_job(job_id, self.job_specs[job_id]))
+                    if configuration.get("schedule_on_job_submit", True):
+                        invocation_types.add(InvocationType.INVOKE_JOB_SUBMIT)
+                elif kind == ITERATION_END:
+                    job = self.jobs[self.job_positions[job_id]]
+                    scheduling_point = self.end_iteration(job)
+                    if job.state is JobState.COMPLETED and configuration.get("schedule_on_job_finalize", True):
+                        invocation_types.add(InvocationType.INVOKE_JOB_COMPLETED)
+                    elif scheduling_point and configuration.get("schedule_on_scheduling_point", True):
+                        invocation_types.add(InvocationType.INVOKE_SCHEDULING_POINT)
+                elif kind == PERIODIC:
+                    invocation_types.add(InvocationType.INVOKE_PERIODIC)
+            self.update_nodes()
+
+            for invocation_type in invocation_order:
+                if invocation_type in invocation_types:
+                    self.invoke(invocation_type)
+                    break
+
+            # stop periodic invocations once no job can make progress anymore
+            submits_left = any(kind == SUBMIT for _, kind, _, _ in self.events)
+            if not submits_left and not self.has_active_jobs():
+                self.events = [e for e in self.events if e[1] != PERIODIC]
+            elif InvocationType.INVOKE_PERIODIC in invocation_types:
+                self.push(self.time + scheduling_interval, PERIODIC)
+
+    def write_output(self, configuration):
+        job_header = ["ID", "Type", "Submit Time", "Start Time", "End Time", "Wait Time", "Makespan",
+                      "Turnaround Time", "Status"]
+        node_header = ["Time", "Node", "State", "Running jobs"]
+        for key, header, rows in (
+            ("job_statistics", job_header, sorted(self.job_statistics)),
+            ("node_utilization", node_header, self.node_utilization),
+        ):
+            with open(configuration.get(key, f"data/output/{key}.csv"), "w") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+
+
+# invocations of the same time are merged, the first matching type is passed to the algorithm
+invocation_order = (
+    InvocationType.INVOKE_JOB_SUBMIT,
+    InvocationType.INVOKE_JOB_COMPLETED,
+    InvocationType.INVOKE_SCHEDULING_POINT,
+    InvocationType.INVOKE_PERIODIC,
+)
+
+
+# simulates the input folder with the algorithm, the output is copied into output_folder
+def simulate(input_folder, algorithm_path, output_folder):
+    configuration = read_json(os.path.join(input_folder, "configuration.json"))
+    job_specs = read_json(get_input_file(input_folder, configuration["jobs_file"]))["jobs"]
+    node_names, node_speeds = read_platform(get_input_file(input_folder, configuration["platform_file"]))
+    models = dict()
+    for job_spec in job_specs:
+        path = job_spec["application_model"]
+        if path not in models:
+            models[path] = ApplicationModel(read_json(get_input_file(input_folder, path)))
+
+    working_directory = tempfile.mkdtemp(prefix="simulation_")
+    os.makedirs(os.path.join(working_directory, "data", "output"))
+    cwd = os.getcwd()
+    os.chdir(working_directory)
+    try:
+        algorithm = load_algorithm(algorithm_path)
+        simulator = EventSimulator(algorithm, configuration, job_specs, models, node_names, node_speeds)
+        try:
+            simulator.run()
+        finally:
+            algorithm.Logger.close()
+        simulator.write_output(configuration)
+        os.makedirs(output_folder, exist_ok=True)
+        shutil.copytree(os.path.join(working_directory, "data", "output"), output_folder, dirs_exist_ok=True)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(working_directory, ignore_errors=True)
+    return output_folder, simulator.invocations, simulator.time
+
+
+def simulate_pair(args):
+    return simulate(*args)
+
+
+def get_arguments(argv):
+    inputs, algorithms = [], []
+    output = os.path.join(os.getcwd(), "output_files")
+    processes = 1
+    opts, _ = getopt.getopt(argv, "i:a:d:p:", ["input=", "algorithm=", "directory=", "processes="])
+    for opt, arg in opts:
+        if opt in ("-i", "--input"):
+            inputs += [os.path.abspath(p) for p in sorted(glob.glob(arg)) if os.path.isdir(p)]
+        elif opt in ("-a", "--algorithm"):
+            algorithms += [os.path.abspath(p) for p in sorted(glob.glob(arg)) if os.path.isfile(p)]
+        elif opt in ("-d", "--directory"):
+            output = os.path.abspath(arg)
+        elif opt in ("-p", "--processes"):
+            processes = int(arg)
+    return inputs, algorithms, output, processes
+
+
+# simulates every input with every algorithm, named like the output of runElastisim.sh
+def start_simulations(sys_args):
+    inputs, algorithms, output, processes = get_arguments(sys_args)
+    assert len(inputs) > 0 and len(algorithms) > 0
+    pairs = [
+        (i, a, os.path.join(output, f"{os.path.basename(i)}({os.path.basename(a)})"))
+        for i in inputs
+        for a in algorithms
+    ]
+    # every simulation gets its own process, the algorithms keep their state in module globals
+    with mp.Pool(processes, maxtasksperchild=1) as pool:
+        for output_folder, invocations, end_time in pool.imap(simulate_pair, pairs):
+            print(f"{output_folder}: {invocations} invocations, simulation ended at {end_time}")
+
+
+if __name__ == "__main__":
+    start_simulations(sys.argv[1:])
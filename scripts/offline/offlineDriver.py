@@ -0,0 +1,319 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Calls the schedule() function of a scheduling algorithm in-process, without ElastiSim, Docker or ZMQ.
+# Jobs are read from a jobs.json or generated with jobGenerator.py, the driver submits them at their submit time,
+# invokes schedule() on every submission, completion and scheduling interval and applies the decisions:
+# assigned nodes start pending jobs, expands and shrinks take effect immediately and jobs progress with the amdahl
+# speedup of their current node amount. Every invocation gets new job and node objects, as with ElastiSim.
+#
+# python3 scripts/offline/offlineDriver.py -a scheduling_algorithms/min_agreement.py -j input_files/small/jobs.json
+# python3 scripts/offline/offlineDriver.py -a scheduling_algorithms/min_agreement.py --malleable_share 50 --seed S1
+import getopt
+import importlib.util
+import json
+import math
+import os
+import sys
+import tempfile
+import time as timer
+
+OFFLINE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, OFFLINE_FOLDER)
+sys.path.append(os.path.join(os.path.dirname(OFFLINE_FOLDER), "input_generation"))
+
+from elastisim_python import Job, Node, JobState, JobType, NodeState, InvocationType
+import jobGenerator
+import jsonGenerator
+
+
+# loads a scheduling algorithm as a new module, the extension modules are reloaded to reset their class attributes
+def load_algorithm(path):
+    for name in [m for m in sys.modules if m == "extension" or m.startswith("extension.")]:
+        del sys.modules[name]
+    algorithm_folder = os.path.dirname(os.path.abspath(path))
+    if algorithm_folder not in sys.path:
+        sys.path.insert(1, algorithm_folder)
+    spec = importlib.util.spec_from_file_location("algorithm", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def read_jobs(path):
+    with open(path) as f:
+        return json.load(f)["jobs"]
+
+
+# generates jobs with the default values of jsonGenerator.py, only rigid and malleable jobs are generated
+def generate_jobs(total_time=60 * 60 * 24, num_nodes=32, malleable_share=50, seed="S0"):
+    _, job_dict, cluster_dict = jsonGenerator.get_default_generation_values()
+    cluster_dict["num_cluster_nodes"] = num_nodes
+    job_dict["seed"] = seed
+    job_dict["node_range"] = range(1, max(2, num_nodes // 4))
+    job_dict["type_probabilities"] = {"RIGID": 100 - malleable_share, "MOLDABLE": 0, "MALLEABLE": malleable_share}
+    job_dict["submit_range"] = range(0, int(job_dict["submit_range"] * total_time))
+    return jobGenerator.generate_jobs(total_time, cluster_dict, job_dict)
+
+
+# creates an elastisim_python job from a job of a jobs.json
+def create_job(identifier, job_spec):
+    job_type = JobType[job_spec["type"]]
+    if "num_nodes" in job_spec:
+        num_nodes = num_nodes_min = num_nodes_max = int(job_spec["num_nodes"])
+    else:
+        num_nodes, num_nodes_min, num_nodes_max = 0, int(job_spec["num_nodes_min"]), int(job_spec["num_nodes_max"])
+    job = Job(identifier, job_type, JobState.PENDING, float(job_spec["submit_time"]), num_nodes, num_nodes_min,
+              num_nodes_max, dict(job_spec.get("arguments", {})))
+    return job
+
+
+# speedup of the application model written by jsonGenerator.py
+def get_amdahl_speedup(parallel_percentage, num_nodes):
+    return 1 / ((1 - parallel_percentage) + parallel_percentage / num_nodes)
+
+
+# Cluster state of the driver, holds the jobs and nodes and applies the decisions of the scheduling algorithm
+class OfflineCluster:
+    def __init__(self, job_specs, num_nodes, flops_per_node=100e9):
+        self.flops_per_node = flops_per_node
+        self.nodes = [Node(i) for i in range(num_nodes)]
+        self.job_specs = sorted(job_specs, key=lambda s: float(s["submit_time"]))
+        self.jobs = []
+        self.remaining_flops = dict()  # running job id -> flops left
+        self.time = 0.0
+
+    def get_rate(self, job):
+        parallel_percentage = float(job.arguments.get("parallel_percentage", 1.0))
+        return get_amdahl_speedup(parallel_percentage, len(job.assigned_nodes)) * self.flops_per_node
+
+    def has_active_jobs(self):
+        return len(self.jobs) < len(self.job_specs) or any(j.state in (JobState.PENDING, JobState.RUNNING) for j in self.jobs)
+
+    # submits all jobs up to the current time, returns True if a job was submitted
+    def submit_jobs(self):
+        submitted = False
+        while len(self.jobs) < len(self.job_specs) and float(self.job_specs[len(self.jobs)]["submit_time"]) <= self.time:
+            job_spec = self.job_specs[len(self.jobs)]
+            self.jobs.append(create_job(len(self.jobs), job_spec))
+            submitted = True
+        return submitted
+
+    # progresses the running jobs until the given time, returns True if a job completed
+    def advance(self, time):
+        completed = False
+        for job in self.jobs:
+            if job.state is not JobState.RUNNING:
+                continue
+            self.remaining_flops[job.identifier] -= self.get_rate(job) * (time - self.time)
+            if self.remaining_flops[job.identifier] <= self.flops_per_node * 1e-9:
+                for node in job.assigned_nodes:
+                    node.assigned_job_ids.discard(job.identifier)
+                    node.state = NodeState.FREE
+                job.assigned_nodes = []
+                job.state = JobState.COMPLETED
+                job.end_time = time
+                del self.remaining_flops[job.identifier]
+                completed = True
+        self.time = time
+        return completed
+
+    # next submission, completion or periodic invocation, None if no job can make progress anymore
+    def get_next_time(self, scheduling_interval):
+        times = []
+        if len(self.jobs) < len(self.job_specs):
+            times.append(float(self.job_specs[len(self.jobs)]["submit_time"]))
+        for job in self.jobs:
+            if job.state is JobState.RUNNING:
+                times.append(self.time + self.remaining_flops[job.identifier] / self.get_rate(job))
+        if len(times) == 0:
+            return None
+        next_periodic = (math.floor(self.time / scheduling_interval) + 1) * scheduling_interval
+        return max(self.time, min(times + [next_periodic]))
+
+    # copies the jobs and nodes into new objects, as ElastiSim passes a new state on every invocation
+    def get_state(self):
+        nodes = [Node(n.identifier, n.state, n.assigned_job_ids) for n in self.nodes]
+        jobs = []
+        for job in self.jobs:
+            copy = Job(job.identifier, job.type, job.state, job.submit_time, job.num_nodes, job.num_nodes_min,
+                       job.num_nodes_max, dict(job.arguments))
+            copy.start_time = job.start_time
+            copy.end_time = job.end_time
+            copy.assigned_nodes = [nodes[n.identifier] for n in job.assigned_nodes]
+            copy.assigned_num_gpus_per_node = job.assigned_num_gpus_per_node
+            jobs.append(copy)
+        return jobs, nodes
+
+    # applies the node assignments of the given state, returns the amount of started, expanded and shrunk jobs
+    def apply(self, jobs):
+        events = {"START": 0, "EXPAND": 0, "SHRINK": 0}
+        for copy, job in zip(jobs, self.jobs):
+            node_ids = [n.identifier for n in copy.assigned_nodes]
+            if node_ids == [n.identifier for n in job.assigned_nodes]:
+                continue
+            if job.state not in (JobState.PENDING, JobState.RUNNING):
+                raise ValueError(f"Job {job.identifier} is {job.state.name} and cannot be assigned nodes")
+            if not job.num_nodes_min <= len(node_ids) <= job.num_nodes_max:
+                raise ValueError(f"Job {job.identifier} assigned {len(node_ids)} nodes, "
+                                 f"allowed are {job.num_nodes_min} to {job.num_nodes_max}")
+
+            if job.state is JobState.PENDING:
+                events["START"] += 1
+                job.state = JobState.RUNNING
+                job.start_time = self.time
+                self.remaining_flops[job.identifier] = float(job.arguments["flops"])
+            elif len(node_ids) > len(job.assigned_nodes):
+                events["EXPAND"] += 1
+            elif len(node_ids) < len(job.assigned_nodes):
+                events["SHRINK"] += 1
+            job.assigned_nodes = [self.nodes[i] for i in node_ids]
+            job.assigned_num_gpus_per_node = copy.assigned_num_gpus_per_node
+
+        for node in self.nodes:
+            node.assigned_job_ids = set()
+        for job in self.jobs:
+            for node in job.assigned_nodes:
+                if len(node.assigned_job_ids) > 0:
+                    raise ValueError(f"Node {node.identifier} assigned to Job {job.identifier} and {node.assigned_job_ids}")
+                node.assigned_job_ids.add(job.identifier)
+        for node in self.nodes:
+            node.state = NodeState.ALLOCATED if len(node.assigned_job_ids) > 0 else NodeState.FREE
+        return events
+
+
+def get_percentile(values, percentile):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+# runs the algorithm until all jobs completed or no job can make progress anymore
+def run(algorithm, cluster: OfflineCluster, scheduling_interval=60):
+    latencies = []
+    events = {"START": 0, "EXPAND": 0, "SHRINK": 0}
+    cluster.submit_jobs()
+    invocation_type = InvocationType.INVOKE_JOB_SUBMIT
+    while cluster.has_active_jobs():
+        jobs, nodes = cluster.get_state()
+        system = {"time": cluster.time, "invocation_type": invocation_type}
+        start = timer.perf_counter()
+        algorithm.schedule(jobs, nodes, system)
+        latencies.append(timer.perf_counter() - start)
+        for event, amount in cluster.apply(jobs).items():
+            events[event] += amount
+
+        next_time = cluster.get_next_time(scheduling_interval)
+        if next_time is None:
+            break
+        completed = cluster.advance(next_time)
+        submitted = cluster.submit_jobs()
+        if submitted:
+            invocation_type = InvocationType.INVOKE_JOB_SUBMIT
+        elif completed:
+            invocation_type = InvocationType.INVOKE_JOB_COMPLETED
+        else:
+            invocation_type = InvocationType.INVOKE_PERIODIC
+
+    return {
+        "invocations": len(latencies),
+        "total_latency": sum(latencies),
+        "p50_latency": get_percentile(latencies, 50),
+        "p95_latency": get_percentile(latencies, 95),
+        "p99_latency": get_percentile(latencies, 99),
+        "max_latency": max(latencies, default=None),
+        "jobs": len(cluster.job_specs),
+        "completed_jobs": sum(1 for j in cluster.jobs if j.state is JobState.COMPLETED),
+        "makespan": max((j.end_time for j in cluster.jobs), default=0.0),
+        **events,
+    }
+
+
+def get_arguments(argv):
+    args = {
+        "algorithm": None,
+        "jobs": None,
+        "directory": None,
+        "num_cluster_nodes": 32,
+        "flops_per_cluster_node": 100e9,
+        "scheduling_interval": 60,
+        "total_time": 60 * 60 * 24,
+        "malleable_share": 50,
+        "seed": "S0",
+        "profile": False,
+        "record": False,
+        "buffer_events": False,
+        "binary_events": False,
+    }
+    arg_names = ["algorithm=", "jobs=", "directory=", "num_cluster_nodes=", "flops_per_cluster_node=",
+                 "scheduling_interval=", "total_time=", "malleable_share=", "seed=", "profile", "record",
+                 "buffer_events", "binary_events"]
+    opts, _ = getopt.getopt(argv, "a:j:d:n:p", arg_names)
+    for opt, arg in opts:
+        if opt in ("-a", "--algorithm"):
+            args["algorithm"] = os.path.abspath(arg)
+        elif opt in ("-j", "--jobs"):
+            args["jobs"] = os.path.abspath(arg)
+        elif opt in ("-d", "--directory"):
+            args["directory"] = os.path.abspath(arg)
+        elif opt in ("-n", "--num_cluster_nodes"):
+            args["num_cluster_nodes"] = int(arg)
+        elif opt == "--flops_per_cluster_node":
+            args["flops_per_cluster_node"] = float(arg)
+        elif opt == "--scheduling_interval":
+            args["scheduling_interval"] = float(arg)
+        elif opt == "--total_time":
+            args["total_time"] = int(eval(arg))
+        elif opt == "--malleable_share":
+            args["malleable_share"] = int(arg)
+        elif opt == "--seed":
+            args["seed"] = arg
+        elif opt in ("-p", "--profile"):
+            args["profile"] = True
+        elif opt == "--record":
+            args["record"] = True
+        elif opt == "--buffer_events":
+            args["buffer_events"] = True
+        elif opt == "--binary_events":
+            args["binary_events"] = True
+    return args
+
+
+# runs the algorithm in the given directory, the logger writes into <directory>/data/output
+def start_driver(sys_args):
+    args = get_arguments(sys_args)
+    assert args["algorithm"] is not None
+    if args["jobs"] is not None:
+        job_specs = read_jobs(args["jobs"])
+    else:
+        job_specs = generate_jobs(args["total_time"], args["num_cluster_nodes"], args["malleable_share"], args["seed"])
+
+    directory = args["directory"] or tempfile.mkdtemp(prefix="offline_")
+    os.makedirs(os.path.join(directory, "data", "output"), exist_ok=True)
+    os.chdir(directory)
+
+    algorithm = load_algorithm(args["algorithm"])
+    algorithm.Profiler.enabled = args["profile"]
+    algorithm.Recorder.enabled = args["record"]
+    algorithm.Logger.buffer_events = args["buffer_events"]
+    algorithm.Logger.binary_events = args["binary_events"]
+    cluster = OfflineCluster(job_specs, args["num_cluster_nodes"], args["flops_per_cluster_node"])
+    try:
+        result = run(algorithm, cluster, args["scheduling_interval"])
+    finally:
+        algorithm.Logger.close()
+    print(f"{os.path.basename(args['algorithm'])} output in {directory}")
+    for k, v in result.items():
+        print(f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    start_driver(sys.argv[1:])
@@ -0,0 +1,166 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Replays the invocations recorded with Recorder.enabled = True (data/output/invocations.jsonl) into an algorithm.
+# Every recorded input is passed to schedule() as new job and node objects, independent of the decisions of the
+# replayed algorithm. Reports the latency of every invocation and the invocations whose decisions differ from the
+# recorded ones. With -r the recording is replayed several times, the fastest run of each invocation is reported.
+#
+# python3 scripts/offline/replayInvocations.py -a scheduling_algorithms/min_agreement.py -f <output>/invocations.jsonl
+import csv
+import getopt
+import json
+import os
+import sys
+import tempfile
+import time as timer
+
+from offlineDriver import load_algorithm, get_percentile
+from elastisim_python import Job, Node, JobState, JobType, NodeState, InvocationType
+
+
+def create_system(system):
+    system = dict(system)
+    if "invocation_type" in system:
+        system["invocation_type"] = InvocationType[system["invocation_type"]]
+    return system
+
+
+def create_state(job_order, jobs, arguments, node_order, nodes):
+    node_objects = dict()
+    for node_id in node_order:
+        state, job_ids = nodes[node_id]
+        node_objects[node_id] = Node(node_id, NodeState[state], job_ids)
+
+    job_objects = []
+    for job_id in job_order:
+        job_type, state, num_nodes, num_nodes_min, num_nodes_max, submit_time, start_time, node_ids = jobs[job_id]
+        job = Job(job_id, JobType[job_type], JobState[state], submit_time, num_nodes, num_nodes_min, num_nodes_max,
+                  dict(arguments[job_id]))
+        job.start_time = start_time
+        job.assigned_nodes = [node_objects[i] for i in node_ids]
+        job_objects.append(job)
+    return job_objects, [node_objects[i] for i in node_order]
+
+
+# reads the recording line by line, yields system, jobs, nodes, recorded decisions and recorded error
+def read_invocations(path):
+    jobs, arguments, nodes = dict(), dict(), dict()
+    job_order, node_order = [], []
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            new_nodes = [values[0] for values in record["v"] if values[0] not in nodes]
+            for job_id, job_arguments in record["a"]:
+                arguments[job_id] = job_arguments
+            for values in record["j"]:
+                jobs[values[0]] = values[1:]
+            for values in record["v"]:
+                nodes[values[0]] = values[1:]
+            job_order = record["o"] if "o" in record else job_order + [a[0] for a in record["a"]]
+            node_order = record["p"] if "p" in record else node_order + new_nodes
+
+            state_jobs, state_nodes = create_state(job_order, jobs, arguments, node_order, nodes)
+            yield create_system(record["s"]), state_jobs, state_nodes, record["d"], record.get("e")
+
+
+def get_decisions(jobs, assigned_nodes):
+    decisions = []
+    for job in jobs:
+        node_ids = [n.identifier for n in job.assigned_nodes]
+        if node_ids != assigned_nodes[job.identifier]:
+            decisions.append([job.identifier, node_ids])
+    return decisions
+
+
+# replays all invocations of the recording once
+# returns (time, invocation type, seconds, decisions, recorded decisions, error) per invocation
+def replay(algorithm, path):
+    results = []
+    for system, jobs, nodes, recorded_decisions, _ in read_invocations(path):
+        assigned_nodes = {j.identifier: [n.identifier for n in j.assigned_nodes] for j in jobs}
+        error = None
+        start = timer.perf_counter()
+        try:
+            algorithm.schedule(jobs, nodes, system)
+        except Exception as e:
+            error = repr(e)
+        seconds = timer.perf_counter() - start
+        invocation_type = system.get("invocation_type")
+        invocation = invocation_type.name if invocation_type is not None else ""
+        results.append((system.get("time"), invocation, seconds, get_decisions(jobs, assigned_nodes),
+                        recorded_decisions, error))
+    return results
+
+
+def write_results(path, results):
+    with open(path, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Time", "Invocation", "Seconds", "Decisions", "Recorded Decisions", "Equal", "Error"])
+        for invocation_time, invocation, seconds, decisions, recorded_decisions, error in results:
+            writer.writerow([invocation_time, invocation, f"{seconds:.9f}", json.dumps(decisions),
+                             json.dumps(recorded_decisions), decisions == recorded_decisions, error or ""])
+
+
+def get_arguments(argv):
+    algorithm = recording = output = None
+    repetitions = 1
+    opts, _ = getopt.getopt(argv, "a:f:o:r:", ["algorithm=", "file=", "output=", "repetitions="])
+    for opt, arg in opts:
+        if opt in ("-a", "--algorithm"):
+            algorithm = os.path.abspath(arg)
+        elif opt in ("-f", "--file"):
+            recording = os.path.abspath(arg)
+        elif opt in ("-o", "--output"):
+            output = os.path.abspath(arg)
+        elif opt in ("-r", "--repetitions"):
+            repetitions = int(arg)
+    return algorithm, recording, output, repetitions
+
+
+def start_replay(sys_args):
+    algorithm_path, recording, output, repetitions = get_arguments(sys_args)
+    assert algorithm_path is not None and recording is not None
+
+    # the logger of the algorithm writes into a temporary data/output folder
+    directory = tempfile.mkdtemp(prefix="replay_")
+    os.makedirs(os.path.join(directory, "data", "output"))
+    os.chdir(directory)
+
+    results = None
+    for _ in range(repetitions):
+        algorithm = load_algorithm(algorithm_path)
+        try:
+            run = replay(algorithm, recording)
+        finally:
+            algorithm.Logger.close()
+        if results is None:
+            results = run
+        else:
+            results = [r if r[2] <= s[2] else r[:2] + (s[2],) + r[3:] for r, s in zip(results, run)]
+
+    if output is not None:
+        write_results(output, results)
+    latencies = [r[2] for r in results]
+    differences = [r for r in results if r[3] != r[4]]
+    print(f"{os.path.basename(algorithm_path)} replayed {recording}")
+    print(f"invocations: {len(results)}")
+    print(f"total_latency: {sum(latencies)}")
+    for percentile in (50, 95, 99):
+        print(f"p{percentile}_latency: {get_percentile(latencies, percentile)}")
+    print(f"max_latency: {max(latencies, default=None)}")
+    print(f"errors: {sum(1 for r in results if r[5] is not None)}")
+    print(f"different_decisions: {len(differences)}")
+    for invocation_time, invocation, _, decisions, recorded_decisions, _ in differences[:5]:
+        print(f"  t={invocation_time} {invocation}: {decisions} recorded {recorded_decisions}")
+
+
+if __name__ == "__main__":
+    start_replay(sys.argv[1:])
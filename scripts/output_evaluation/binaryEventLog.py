@@ -0,0 +1,85 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Reads the binary event log written by the Logger (see BinaryEventWriter in ElastiSimLogger.py)
+# and converts it back to the event.csv layout
+import numpy as np
+import csv
+import os
+import sys
+
+
+EVENT_FILE = "event.bin"
+EVENT_NODE_FILE = "event_nodes.bin"
+
+# same order as EventType in ElastiSimLogger.py
+EVENT_TYPES = ("START", "EXPAND", "SHRINK", "STOP", "KILL", "AGREEMENT_ADDED", "AGREEMENT_FULLFILLED")
+
+EVENT_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("event", "u1"),
+    ("job", "<i4"),
+    ("other_job", "<i4"),
+    ("node_offset", "<i8"),
+    ("node_amount", "<i4"),
+])
+NODE_DTYPE = np.dtype("<i4")
+
+
+def has_binary_events(path):
+    return os.path.isfile(os.path.join(path, EVENT_FILE))
+
+
+def event_type_value(name):
+    return EVENT_TYPES.index(name)
+
+
+def map_file(file, dtype):
+    if os.path.getsize(file) < dtype.itemsize:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(file, dtype=dtype, mode="r")
+
+
+# memory-maps the event records and the packed node ids of the given output directory
+def read_binary_events(path):
+    events = map_file(os.path.join(path, EVENT_FILE), EVENT_DTYPE)
+    nodes = map_file(os.path.join(path, EVENT_NODE_FILE), NODE_DTYPE)
+    return events, nodes
+
+
+def get_event_nodes(event, nodes):
+    return nodes[event["node_offset"]: event["node_offset"] + event["node_amount"]]
+
+
+# converts one event record into a row of event.csv
+def event_to_row(event, nodes):
+    time = "" if np.isnan(event["time"]) else str(int(event["time"]))
+    job_string = f"J{event['job']}"
+    if event["other_job"] >= 0:
+        job_string += f" -> J{event['other_job']}"
+    node_string = "[" + ", ".join(f"N{n}" for n in get_event_nodes(event, nodes)) + "]"
+    return [time, EVENT_TYPES[event["event"]], job_string, node_string]
+
+
+def convert_to_csv(path, out_file):
+    events, nodes = read_binary_events(path)
+    with open(out_file, "w") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Time", "Event", "Jobs", "Nodes"])
+        for event in events:
+            writer.writerow(event_to_row(event, nodes))
+
+
+# include output directory as argument, optionally the csv file to write, default=<directory>/event.csv
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        raise ValueError("Unknown Argument Size")
+    out_file = sys.argv[2] if len(sys.argv) == 3 else os.path.join(sys.argv[1], "event.csv")
+    convert_to_csv(sys.argv[1], out_file)
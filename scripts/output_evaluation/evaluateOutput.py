@@ -16,6 +16,7 @@ import csv
 import re
 import multiprocessing as mp
 import pathlib
+import numpy as np
 
 
 regex_artifical = "^\d+D\[\d+\|\d+\|\d+\]#.*\{\d+,\d+\|.*,.*\}$"
@@ -241,6 +242,43 @@ def generate_meta_statistics(statistics, out_path, plot=False):
         plot_evaluation(out_path, list(metrics.keys()))
 
 
+# reads the timings.csv of every output and groups the phase latencies by scheduler
+def get_phase_timings(paths):
+    timings = dict()  # scheduler -> phase -> seconds
+    for path in paths:
+        name = str(pathlib.Path(path))
+        scheduler = name[name.rfind("(") + 1: -1] if name.endswith(")") else name[name.rfind("/") + 1:]
+        if not os.path.isfile(path + "timings.csv"):
+            continue
+        for row in get_csv_dict(path + "timings.csv"):
+            phases = timings.setdefault(scheduler, dict())
+            phases.setdefault(row["Phase"], []).append(float(row["Seconds"]))
+    return timings
+
+
+# summarizes the profiled phases as p50/p95/p99 latency in milliseconds per phase per scheduler
+def generate_timing_statistics(paths, out_path=None, percentiles=(50, 95, 99)):
+    timings = get_phase_timings(paths)
+    if len(timings) == 0:
+        return
+    header = ["scheduler", "phase", "samples"] + [f"p{p}_ms" for p in percentiles]
+    rows = []
+    for scheduler in sorted(timings):
+        for phase, seconds in sorted(timings[scheduler].items()):
+            latencies = np.percentile(np.array(seconds) * 1000, percentiles)
+            rows.append([scheduler, phase, len(seconds)] + [f_float(v) for v in latencies])
+
+    if out_path is None:
+        for row in [header] + rows:
+            print(", ".join(str(v) for v in row))
+        return
+    print(f"Generating Timing Statistic")
+    with open(out_path, "w") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
 def get_args():
     statistics_flag = figure_flag = False
     paths = []
@@ -299,6 +337,7 @@ def evaluate_output():
     if statistics_flag:
         if len(statistics) <= 1:
             print(statistics)
+            generate_timing_statistics(paths)
         else:
             meta_output = os.path.commonpath(paths)
             if not meta_output.endswith("/"):
@@ -306,6 +345,7 @@ def evaluate_output():
             if not meta_output.endswith("/output_files/"):
                 meta_output = os.getcwd() + "/output_files/"
             generate_meta_statistics(statistics, meta_output, True)
+            generate_timing_statistics(paths, meta_output + "timings.csv")
 
 
 if __name__ == "__main__":
@@ -9,6 +9,8 @@
 # SPDX-License-Identifier: EPL-2.0
 # ---------------------------------------------------------------------
 from ElastiSim_Statistics import plot_jobs_gantt, plot_node_utilization
+from binaryEventLog import read_binary_events, has_binary_events, event_type_value
+import numpy as np
 import csv
 
 
@@ -138,9 +140,29 @@ def generate_event_statistics(path: str, metrics: dict, job_amount, malleable_am
     metrics["expand_event"] = event_dict["EXPAND"]
 
 
+# same as generate_event_statistics, but reads the binary event log without parsing strings
+def generate_binary_event_statistics(path: str, metrics: dict, job_amount, malleable_amount=None):
+    events, _ = read_binary_events(path)
+    if len(events) == 0:
+        return
+
+    for event_type, metric in (("SHRINK", "shrink_event"), ("EXPAND", "expand_event")):
+        selected = events[events["event"] == event_type_value(event_type)]
+        node_amounts = selected["node_amount"]
+        events_per_job = np.unique(selected["job"], return_counts=True)[1]
+        metrics[metric] = [
+            len(selected),
+            avg(node_amounts, default=0),
+            avg(events_per_job, div=malleable_amount or job_amount, default=0),
+        ]
+
+
 def generate_statistics(path):
     metrics = dict()
     job_amount, malleable_job_amount = generate_job_statistics(path + "job_statistics.csv", metrics)
     generate_node_statistics(path + "node_utilization.csv", metrics)
-    generate_event_statistics(path + "event.csv", metrics, malleable_job_amount)
+    if has_binary_events(path):
+        generate_binary_event_statistics(path, metrics, malleable_job_amount)
+    else:
+        generate_event_statistics(path + "event.csv", metrics, malleable_job_amount)
     return metrics
@@ -0,0 +1,87 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+# Shared helpers of the scheduler tests, the schedulers run on an OfflineCluster of scripts/offline
+# with the elastisim_python stand-in instead of ElastiSim.
+import csv
+import os
+import sys
+
+import pytest
+
+REPOSITORY_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALGORITHM_FOLDER = os.path.join(REPOSITORY_FOLDER, "scheduling_algorithms")
+sys.path.insert(0, os.path.join(REPOSITORY_FOLDER, "scripts", "offline"))
+
+from offlineDriver import OfflineCluster, load_algorithm
+from elastisim_python import InvocationType, JobState, NodeState
+
+
+# job of a jobs.json as written by jsonGenerator.py, runtime in seconds on num_nodes_min nodes
+def create_job_spec(num_nodes, runtime=3600.0, submit_time=0.0, num_nodes_max=None):
+    arguments = {"flops": runtime * 100e9 * num_nodes}
+    if num_nodes_max is None:
+        return {"type": "RIGID", "submit_time": submit_time, "num_nodes": num_nodes, "arguments": arguments}
+    return {"type": "MALLEABLE", "submit_time": submit_time, "num_nodes_min": num_nodes,
+            "num_nodes_max": num_nodes_max, "arguments": arguments}
+
+
+# runs the job on the given nodes, as if an earlier invocation had started it
+def start_job(cluster: OfflineCluster, job_id, node_ids):
+    job = cluster.jobs[job_id]
+    job.assigned_nodes = [cluster.nodes[i] for i in node_ids]
+    job.state = JobState.RUNNING
+    job.start_time = cluster.time
+    cluster.remaining_flops[job_id] = float(job.arguments["flops"])
+    for node in job.assigned_nodes:
+        node.state = NodeState.ALLOCATED
+        node.assigned_job_ids.add(job_id)
+
+
+# completes the running job at the current time and frees its nodes
+def end_job(cluster: OfflineCluster, job_id):
+    cluster.remaining_flops[job_id] = 0.0
+    cluster.advance(cluster.time)
+
+
+# invokes the scheduler once and applies its decisions to the cluster, returns the jobs passed to the scheduler
+def invoke(algorithm, cluster: OfflineCluster, invocation_type=InvocationType.INVOKE_PERIODIC):
+    jobs, nodes = cluster.get_state()
+    algorithm.schedule(jobs, nodes, {"time": cluster.time, "invocation_type": invocation_type})
+    cluster.apply(jobs)
+    return jobs
+
+
+# ids of the nodes the job of the cluster runs on
+def get_node_ids(cluster: OfflineCluster, job_id):
+    return [n.identifier for n in cluster.jobs[job_id].assigned_nodes]
+
+
+# rows (time, event, jobs, nodes) of the event.csv written by the scheduler
+def read_events():
+    with open("data/output/event.csv") as f:
+        return list(csv.reader(f))[1:]
+
+
+# loads a scheduler from scheduling_algorithms by file name, the events are written into a temporary folder
+@pytest.fixture
+def load_scheduler(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/output")
+    algorithms = []
+
+    def load(name):
+        algorithm = load_algorithm(os.path.join(ALGORITHM_FOLDER, name))
+        algorithms.append(algorithm)
+        return algorithm
+
+    yield load
+    for algorithm in algorithms:
+        algorithm.Logger.close()
@@ -0,0 +1,65 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import pytest
+
+from conftest import OfflineCluster, JobState, create_job_spec, start_job, end_job, invoke, get_node_ids
+
+ALGORITHMS = ["min_agreement.py", "pref_steal_agreement.py", "average_agreement.py"]
+
+
+# job 1 waits for the first num_nodes nodes, job 0 runs on nodes 0 and 1, job 2 on node 2 and node 3 is free
+def create_cluster(algorithm, cancellation, num_nodes):
+    algorithm.agreements.cancellation = cancellation
+    cluster = OfflineCluster([create_job_spec(2), create_job_spec(num_nodes), create_job_spec(1)], 4)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1])
+    start_job(cluster, 2, [2])
+    jobs, nodes = cluster.get_state()
+    algorithm.agreements.add_agreement(jobs[1], nodes[:num_nodes])
+    return cluster
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_cancellation_starts_waiting_job_on_free_nodes(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, True, 2)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[1].state is JobState.PENDING
+
+    # node 2 is freed, job 1 starts on nodes 2 and 3 and gives up its agreement
+    end_job(cluster, 2)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [2, 3]
+    assert algorithm.agreements.job_dict == dict() and algorithm.agreements.node_dict == dict()
+
+
+# job 1 needs its agreement node 2 and both nodes of job 0, one free node without agreement does not suffice
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_cancellation_keeps_agreement_if_free_nodes_do_not_suffice(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, True, 3)
+    end_job(cluster, 2)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[1].state is JobState.PENDING
+    assert algorithm.agreements.job_dict == {1: {0, 1, 2}}
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_waiting_job_keeps_agreement_without_cancellation(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, False, 2)
+    end_job(cluster, 2)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[1].state is JobState.PENDING
+
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [0, 1]
@@ -0,0 +1,50 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import os
+import sys
+import time
+
+from conftest import ALGORITHM_FOLDER, REPOSITORY_FOLDER, OfflineCluster, read_events
+from offlineDriver import generate_jobs, run
+
+sys.path.insert(0, ALGORITHM_FOLDER)
+sys.path.insert(0, os.path.join(REPOSITORY_FOLDER, "scripts", "output_evaluation"))
+
+from binaryEventLog import convert_to_csv
+from extension.ElastiSimLogger import BinaryEventWriter
+
+
+def test_binary_events_convert_to_event_csv(load_scheduler, monkeypatch):
+    algorithm = load_scheduler("min_agreement.py")
+    monkeypatch.setattr(algorithm.Logger, "buffer_events", True)
+    monkeypatch.setattr(algorithm.Logger, "binary_events", True)
+    run(algorithm, OfflineCluster(generate_jobs(total_time=2 * 60 * 60, num_nodes=16, seed="S1"), 16))
+    algorithm.Logger.close()
+    events = read_events()
+    assert len(events) > 0
+
+    convert_to_csv("data/output", "data/output/event.csv")
+    assert read_events() == events
+
+
+# the events are in the files once flush_size events are written, without a flush or close
+def test_binary_event_writer_flushes_by_size(load_scheduler):
+    writer = BinaryEventWriter("data/output/event.bin", "data/output/event_nodes.bin", flush_size=2, flush_interval=60.0)
+    try:
+        writer.write(0.0, 0, 1, -1, [0, 1])
+        writer.write(60.0, 1, 1, -1, [2])
+        deadline = time.monotonic() + 10
+        while os.path.getsize("data/output/event.bin") < 2 * writer.record.size and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert os.path.getsize("data/output/event.bin") == 2 * writer.record.size
+        assert os.path.getsize("data/output/event_nodes.bin") == 3 * 4
+    finally:
+        writer.close()
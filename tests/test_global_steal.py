@@ -0,0 +1,52 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import pytest
+
+from conftest import OfflineCluster, JobState, create_job_spec, start_job, invoke, get_node_ids
+
+ALGORITHMS = ["min_steal_agreement.py", "pref_steal_agreement.py", "average_steal_agreement.py"]
+
+
+# job 0 runs on the agreement nodes 0 and 1 of job 1, the agreement nodes 2 of job 2 and 3 of job 3 are free
+# the handler is replaced as global_steal selects it when the scheduler is loaded
+def create_cluster(algorithm, global_steal):
+    handler = algorithm.GlobalStealAgreementHandler if global_steal else algorithm.StealAgreementHandler
+    algorithm.agreements = handler(state=algorithm.state)
+    cluster = OfflineCluster([create_job_spec(2), create_job_spec(2), create_job_spec(1), create_job_spec(1)], 4)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1])
+    jobs, nodes = cluster.get_state()
+    algorithm.agreements.add_agreement(jobs[1], nodes[:2])
+    algorithm.agreements.add_agreement(jobs[2], [nodes[2]])
+    algorithm.agreements.add_agreement(jobs[3], [nodes[3]])
+    return cluster
+
+
+# the jobs with the fewest agreement nodes start, job 1 keeps waiting for its own nodes
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_global_steal_starts_most_waiting_jobs(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, True)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 2) == [2] and get_node_ids(cluster, 3) == [3]
+    assert cluster.jobs[1].state is JobState.PENDING
+    assert algorithm.agreements.job_dict == {1: {0, 1}}
+
+
+# in queue order job 1 steals the free agreement nodes of jobs 2 and 3, which wait for the nodes of job 0 instead
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_steal_in_queue_order(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, False)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [2, 3]
+    assert cluster.jobs[2].state is JobState.PENDING and cluster.jobs[3].state is JobState.PENDING
+    assert algorithm.agreements.job_dict == {2: {0}, 3: {1}}
@@ -0,0 +1,59 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import pytest
+
+from conftest import OfflineCluster, JobState, create_job_spec, start_job, end_job, invoke, get_node_ids
+
+ALGORITHMS = ["min_agreement.py", "pref_steal_agreement.py", "average_common_pool.py"]
+
+
+# job 1 waits for all nodes, its agreement is due once job 0 ends after an hour
+# job 2 runs for two hours and job 3 for half an hour on the idle agreement nodes 2 and 3
+def create_cluster(algorithm, lending):
+    algorithm.agreements.lending = lending
+    cluster = OfflineCluster(
+        [create_job_spec(2), create_job_spec(4), create_job_spec(2, 7200.0), create_job_spec(2, 1800.0)], 4
+    )
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1])
+    jobs, nodes = cluster.get_state()
+    algorithm.agreements.add_agreement(jobs[1], nodes, 3600.0)
+    return cluster
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_lending_runs_jobs_that_end_before_the_agreement_is_due(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, True)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[2].state is JobState.PENDING
+    assert get_node_ids(cluster, 3) == [2, 3]
+
+    # the agreement is resolved once the lent nodes are free again
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[1].state is JobState.PENDING
+    end_job(cluster, 3)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [0, 1, 2, 3]
+    assert algorithm.agreements.lent_nodes == dict()
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_agreement_nodes_stay_idle_without_lending(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, False)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[3].state is JobState.PENDING
+
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [0, 1, 2, 3]
@@ -0,0 +1,67 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import pytest
+
+from conftest import OfflineCluster, JobState, create_job_spec, start_job, end_job, invoke, get_node_ids
+
+ALGORITHMS = ["min_agreement.py", "pref_agreement.py", "average_agreement.py"]
+
+
+# the malleable job 1 (2 to 4 nodes) waits for all nodes, its agreement nodes 2 and 3 are free
+def create_cluster(algorithm, partial_start):
+    algorithm.agreements.partial_start = partial_start
+    cluster = OfflineCluster([create_job_spec(2), create_job_spec(2, num_nodes_max=4)], 4)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1])
+    jobs, nodes = cluster.get_state()
+    algorithm.agreements.add_agreement(jobs[1], nodes)
+    return cluster
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_partial_start_starts_on_free_agreement_nodes(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    agreements = algorithm.agreements
+    cluster = create_cluster(algorithm, True)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [2, 3]
+    assert agreements.job_dict == {1: {0, 1}} and agreements.partial_jobs == {1}
+
+    # the job is expanded by the remaining agreement nodes once they are free
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert sorted(get_node_ids(cluster, 1)) == [0, 1, 2, 3]
+    assert agreements.job_dict == dict() and agreements.partial_jobs == set()
+
+
+# the agreement nodes of an ended partial job are released
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_partial_start_drops_agreement_of_ended_job(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    agreements = algorithm.agreements
+    cluster = create_cluster(algorithm, True)
+    invoke(algorithm, cluster)
+    end_job(cluster, 1)
+    invoke(algorithm, cluster)
+    assert agreements.job_dict == dict() and agreements.node_dict == dict()
+    assert agreements.partial_jobs == set()
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_waiting_job_starts_on_all_agreement_nodes_without_partial_start(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(algorithm, False)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[1].state is JobState.PENDING
+
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [0, 1, 2, 3]
@@ -0,0 +1,75 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import pytest
+
+from conftest import OfflineCluster, JobState, create_job_spec, start_job, end_job, invoke, get_node_ids
+
+
+# jobs 0 and 1 run on the agreement nodes of the pending jobs 3 and 4, job 2 keeps the other nodes busy
+def create_cluster():
+    cluster = OfflineCluster([create_job_spec(2) for _ in range(5)], 6)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [1, 2])
+    start_job(cluster, 1, [3, 4])
+    start_job(cluster, 2, [0, 5])
+    return cluster
+
+
+@pytest.mark.parametrize("name", ["min_common_pool.py", "pref_common_pool.py", "average_common_pool.py"])
+def test_pool_hands_over_agreement_nodes(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    agreements = algorithm.agreements
+    cluster = create_cluster()
+    jobs, nodes = cluster.get_state()
+    agreements.add_agreement(jobs[3], [nodes[1], nodes[2]])
+    agreements.add_agreement(jobs[4], [nodes[3], nodes[4]])
+    invoke(algorithm, cluster)
+
+    # job 3 starts on the free agreement nodes of job 4, job 4 waits for the nodes of job 3 instead
+    end_job(cluster, 1)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 3) == [3, 4]
+    assert agreements.job_dict == {4: {1, 2}}
+    assert agreements.node_dict == {1: 4, 2: 4}
+    assert agreements.outstanding == {4: 2}
+
+    # the handed over nodes are freed for job 4
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert cluster.jobs[4].state is JobState.RUNNING
+    assert get_node_ids(cluster, 4) == [1, 2]
+    assert agreements.job_dict == dict() and agreements.node_dict == dict()
+
+
+def test_pool_gives_up_latest_agreement_node_for_free_node(load_scheduler):
+    algorithm = load_scheduler("min_common_pool.py")
+    agreements = algorithm.agreements
+    cluster = OfflineCluster([create_job_spec(2) for _ in range(5)], 6)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [1, 2])
+    start_job(cluster, 1, [3, 5])
+    start_job(cluster, 2, [0, 4])
+    jobs, nodes = cluster.get_state()
+    agreements.add_agreement(jobs[3], [nodes[1], nodes[3]])
+    agreements.add_agreement(jobs[4], [nodes[2], nodes[4]])
+    invoke(algorithm, cluster)
+
+    # job 3 starts on its free agreement node 3 and on node 5 without agreement, for node 5 the latest agreement
+    # node 4 of job 4 is given up and job 4 waits for the remaining node 1 of job 3 instead
+    end_job(cluster, 1)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 3) == [3, 5]
+    assert agreements.job_dict == {4: {1, 2}}
+    assert agreements.outstanding == {4: 2}
+
+    end_job(cluster, 0)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 4) == [1, 2]
@@ -0,0 +1,51 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import pytest
+
+from conftest import OfflineCluster, create_job_spec, start_job, end_job, invoke, get_node_ids
+
+ALGORITHMS = ["min_agreement.py", "pref_agreement.py", "average_agreement.py"]
+
+
+# the malleable job 0 (2 to 4 nodes) runs on nodes 0 and 1, job 1 on node 2 and node 3 is free
+def create_cluster(**arguments):
+    job_spec = create_job_spec(2, num_nodes_max=4)
+    job_spec["arguments"].update(arguments)
+    cluster = OfflineCluster([job_spec, create_job_spec(1)], 4)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1])
+    start_job(cluster, 1, [2])
+    return cluster
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_dwell_time_delays_the_next_resize(load_scheduler, name):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(dwell_time=600.0)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 0) == [0, 1, 3]
+
+    # node 2 is freed right after the expand, the job is expanded again once its dwell time has passed
+    end_job(cluster, 1)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 0) == [0, 1, 3]
+    cluster.advance(600.0)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 0) == [0, 1, 3, 2]
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+@pytest.mark.parametrize("resize_cost, expanded", [(60.0, True), (1e6, False)])
+def test_expand_only_if_it_pays_off(load_scheduler, name, resize_cost, expanded):
+    algorithm = load_scheduler(name)
+    cluster = create_cluster(resize_cost=resize_cost)
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 0) == ([0, 1, 3] if expanded else [0, 1])
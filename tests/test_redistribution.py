@@ -0,0 +1,44 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+from conftest import OfflineCluster, InvocationType, create_job_spec, start_job, invoke, get_node_ids
+
+
+# the malleable jobs 0 and 1 (1 to 4 nodes) run on nodes 0 to 2 and on node 3,
+# job 1 gains more speedup from the nodes of job 0 than job 0 loses
+def create_cluster():
+    job_specs = [create_job_spec(1, num_nodes_max=4), create_job_spec(1, num_nodes_max=4)]
+    job_specs[0]["arguments"]["parallel_percentage"] = 0.5
+    job_specs[1]["arguments"]["parallel_percentage"] = 1.0
+    cluster = OfflineCluster(job_specs, 4)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1, 2])
+    start_job(cluster, 1, [3])
+    return cluster
+
+
+def test_redistribution_moves_nodes_to_the_highest_marginal_speedup(load_scheduler):
+    algorithm = load_scheduler("redistribution.py")
+    cluster = create_cluster()
+    invoke(algorithm, cluster, InvocationType.INVOKE_JOB_SUBMIT)
+    assert get_node_ids(cluster, 0) == [0]
+    assert algorithm.agreements.job_dict == {1: {1, 2}}
+
+    # job 1 is expanded by the shrunk nodes once they are free
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 1) == [3, 1, 2]
+    assert algorithm.agreements.job_dict == dict()
+
+
+def test_periodic_invocations_do_not_redistribute(load_scheduler):
+    algorithm = load_scheduler("redistribution.py")
+    cluster = create_cluster()
+    invoke(algorithm, cluster)
+    assert get_node_ids(cluster, 0) == [0, 1, 2] and get_node_ids(cluster, 1) == [3]
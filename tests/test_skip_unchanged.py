@@ -0,0 +1,78 @@
+# ---------------------------------------------------------------------
+# Copyright (c) 2023 Wagomu project.
+#
+# This program and the accompanying materials are made available to you under
+# the terms of the Eclipse Public License 1.0 which accompanies this
+# distribution,
+# and is available at https://www.eclipse.org/legal/epl-v20.html
+#
+# SPDX-License-Identifier: EPL-2.0
+# ---------------------------------------------------------------------
+import glob
+import os
+
+import pytest
+
+from conftest import ALGORITHM_FOLDER, OfflineCluster, create_job_spec, start_job, end_job, invoke, read_events
+from offlineDriver import generate_jobs, run
+
+ALGORITHMS = sorted(os.path.basename(path) for path in glob.glob(os.path.join(ALGORITHM_FOLDER, "*.py")))
+
+
+# counts the skipped invocations of the scheduler in the returned list
+def count_skipped(algorithm):
+    is_unchanged = algorithm.state.is_unchanged
+    skipped = []
+
+    def record(*args):
+        unchanged = is_unchanged(*args)
+        skipped.append(unchanged)
+        return unchanged
+
+    algorithm.state.is_unchanged = record
+    return skipped
+
+
+# runs the scheduler on a generated workload, returns the events and the amount of skipped invocations
+def simulate(load_scheduler, name, skip_unchanged):
+    algorithm = load_scheduler(name)
+    algorithm.StateIndex.skip_unchanged = skip_unchanged
+    skipped = count_skipped(algorithm)
+    run(algorithm, OfflineCluster(generate_jobs(total_time=6 * 60 * 60, num_nodes=32, seed="S1"), 32))
+    algorithm.Logger.close()
+    events = read_events()
+    os.remove("data/output/event.csv")
+    return events, sum(skipped)
+
+
+@pytest.mark.parametrize("name", ALGORITHMS)
+def test_skip_unchanged_keeps_decisions(load_scheduler, name):
+    events, skipped = simulate(load_scheduler, name, True)
+    assert len(events) > 0 and skipped > 0
+    assert simulate(load_scheduler, name, False) == (events, 0)
+
+
+# job 1 waits for all nodes, so no invocation makes a decision
+def test_changes_are_not_skipped(load_scheduler):
+    algorithm = load_scheduler("min_agreement.py")
+    skipped = count_skipped(algorithm)
+    cluster = OfflineCluster([create_job_spec(2), create_job_spec(4), create_job_spec(1)], 4)
+    cluster.submit_jobs()
+    start_job(cluster, 0, [0, 1])
+    start_job(cluster, 2, [2])
+    invoke(algorithm, cluster)
+    invoke(algorithm, cluster)
+    assert skipped == [False, True]
+
+    # a freed node
+    end_job(cluster, 2)
+    invoke(algorithm, cluster)
+    invoke(algorithm, cluster)
+    assert skipped[2:] == [False, True]
+
+    # an agreement
+    jobs, nodes = cluster.get_state()
+    algorithm.agreements.add_agreement(jobs[1], nodes[:2])
+    invoke(algorithm, cluster)
+    invoke(algorithm, cluster)
+    assert skipped[4:] == [False, True]